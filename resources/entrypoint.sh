@@ -10,21 +10,36 @@ echo "Postgres database is up."
 
 touch -a /sagexit/log/uwsgi.log
 touch -a /sagexit/log/django.log
+touch -a /sagexit/log/uvicorn.log
 
 cd /sagexit/src/website/
 
 ./manage.py compilescss
 ./manage.py collectstatic --no-input -v0 --ignore="*.scss"
 ./manage.py migrate --no-input
+./manage.py archive_reservations
 
 chown --recursive www-data:www-data /sagexit/
 
+# The change streams are long-lived, so nginx routes them to uvicorn, where they wait in the event loop instead of
+# occupying one of the uwsgi threads.
+echo "Starting uvicorn server."
+runuser --user=www-data -- uvicorn sagexit.asgi:application \
+    --app-dir=/sagexit/src/website \
+    --host=0.0.0.0 \
+    --port=8001 \
+    --workers=2 \
+    --proxy-headers \
+    --forwarded-allow-ips='*' \
+    >> /sagexit/log/uvicorn.log 2>&1 &
+
 echo "Starting uwsgi server."
 uwsgi --chdir=/sagexit/src/website \
     --module=sagexit.wsgi:application \
     --master --pidfile=/tmp/project-master.pid \
     --socket=:8000 \
     --processes=5 \
+    --threads=8 \
     --uid=www-data --gid=www-data \
     --harakiri=600 \
     --post-buffering=16384 \
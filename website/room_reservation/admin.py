@@ -1,18 +1,206 @@
 from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
 
-from .models import Reservation, Room
+from . import occupancy
+from .models import (
+    ArchivedReservation,
+    OccupancyRollup,
+    OccupancySlot,
+    Reservation,
+    ReservationSeries,
+    Room,
+    RoomPolicy,
+)
+from .signals import bulk_changed, bulk_delete
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the row estimate of Postgres for large unfiltered tables, instead of counting all rows.
+
+    Filtered querysets and tables with less than `exact_below` rows are still counted exactly.
+    """
+
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        """Return the (estimated) number of objects."""
+        query = self.object_list.query
+        if connection.vendor == "postgresql" and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row is not None and row[0] >= self.exact_below:
+                return int(row[0])
+        return super().count
 
 
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
-    """Admin class for Reservation."""
+    """Admin class for Reservation, which is usable with millions of reservations."""
 
-    list_display = ("reservee", "room", "start_time", "end_time")
-    list_filter = ("room", "start_time", "end_time")
+    list_display = ("reservee", "room", "start_time", "end_time", "block_whole_room")
+    list_filter = ("room", "block_whole_room")
+    list_select_related = ("reservee", "room")
+    date_hierarchy = "start_time"
+    autocomplete_fields = ("reservee", "room", "series")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("delete_reservations", "block_rooms", "unblock_rooms")
+    delete_chunk_size = 2000
+
+    def get_actions(self, request):
+        """Replace the default delete action, which deletes the reservations one by one."""
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def delete_reservations(self, request, queryset):
+        """
+        Delete the selected reservations after asking for confirmation.
+
+        The reservations are deleted in chunks of `delete_chunk_size`, with a query to read the state of each chunk
+        and one to delete it, so the reservations are never all loaded at once.
+        """
+        if request.POST.get("post") != "yes":
+            context = {
+                **self.admin_site.each_context(request),
+                "title": "Are you sure?",
+                "opts": self.model._meta,
+                "media": self.media,
+                "count": queryset.count(),
+                "select_across": request.POST.get("select_across") == "1",
+                "selected": request.POST.getlist(ACTION_CHECKBOX_NAME),
+                "action_checkbox_name": ACTION_CHECKBOX_NAME,
+            }
+            return TemplateResponse(request, "admin/room_reservation/reservation/delete_reservations.html", context)
+
+        deleted = 0
+        with transaction.atomic(), bulk_delete():
+            while True:
+                chunk = list(
+                    queryset.order_by("pk").values_list("pk", *occupancy.STATE_FIELDS)[: self.delete_chunk_size]
+                )
+                if not chunk:
+                    break
+                # A raw delete does not load the reservations for the post_delete receivers, which do nothing in
+                # bulk_delete() anyway, and nothing references reservations that would have to be collected.
+                Reservation.objects.filter(pk__in=[reservation[0] for reservation in chunk])._raw_delete(queryset.db)
+                occupancy.record(removed=[reservation[1:] for reservation in chunk])
+                deleted += len(chunk)
+        self.message_user(request, f"Deleted {deleted} reservations.")
+
+    delete_reservations.short_description = "Delete selected reservations"
+    delete_reservations.allowed_permissions = ("delete",)
+
+    @transaction.atomic
+    def set_blocked(self, request, queryset, blocked):
+        """Set whether the selected reservations block their room with a single query."""
+        states = list(queryset.exclude(block_whole_room=blocked).values_list(*occupancy.STATE_FIELDS))
+        queryset.exclude(block_whole_room=blocked).update(block_whole_room=blocked)
+        bulk_changed(added=[(*state[:3], blocked) for state in states], removed=states)
+        self.message_user(request, f"Updated {len(states)} reservations.")
+
+    def block_rooms(self, request, queryset):
+        """Let the selected reservations block their room."""
+        self.set_blocked(request, queryset, True)
+
+    block_rooms.short_description = "Block the room during the selected reservations"
+    block_rooms.allowed_permissions = ("change",)
+
+    def unblock_rooms(self, request, queryset):
+        """Stop the selected reservations from blocking their room."""
+        self.set_blocked(request, queryset, False)
+
+    unblock_rooms.short_description = "Stop blocking the room during the selected reservations"
+    unblock_rooms.allowed_permissions = ("change",)
 
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
     """Admin class for Room."""
 
-    list_display = ("name",)
+    list_display = ("name", "capacity", "policy")
+    list_select_related = ("policy",)
+    search_fields = ("name",)
+
+
+@admin.register(RoomPolicy)
+class RoomPolicyAdmin(admin.ModelAdmin):
+    """Admin class for RoomPolicy."""
+
+    list_display = (
+        "name",
+        "opening_time",
+        "closing_time",
+        "open_in_weekends",
+        "horizon",
+        "max_duration",
+        "max_concurrent_reservations",
+    )
+
+
+@admin.register(ReservationSeries)
+class ReservationSeriesAdmin(admin.ModelAdmin):
+    """Admin class for ReservationSeries."""
+
+    list_display = ("reservee", "frequency", "until")
+    list_select_related = ("reservee",)
+    search_fields = ("reservee__username", "reservee__first_name", "reservee__last_name")
+
+
+@admin.register(OccupancyRollup)
+class OccupancyRollupAdmin(admin.ModelAdmin):
+    """Admin class for OccupancyRollup, which is only maintained automatically."""
+
+    list_display = ("room", "date", "hour", "occupied_seats", "blocked")
+    list_filter = ("room",)
+    date_hierarchy = "date"
+
+    def has_add_permission(self, request):
+        """Disallow adding rollups by hand."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Disallow changing rollups by hand."""
+        return False
+
+
+@admin.register(OccupancySlot)
+class OccupancySlotAdmin(admin.ModelAdmin):
+    """Admin class for OccupancySlot, which is only maintained automatically."""
+
+    list_display = ("room", "start", "booked", "blocked")
+    list_filter = ("room",)
+    date_hierarchy = "start"
+
+    def has_add_permission(self, request):
+        """Disallow adding slots by hand."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Disallow changing slots by hand."""
+        return False
+
+
+@admin.register(ArchivedReservation)
+class ArchivedReservationAdmin(admin.ModelAdmin):
+    """Admin class for ArchivedReservation, which can only be browsed."""
+
+    list_display = ("reservee", "room", "start_time", "end_time")
+    list_filter = ("room",)
+    list_select_related = ("reservee", "room")
+    date_hierarchy = "start_time"
+
+    def has_add_permission(self, request):
+        """Disallow adding archived reservations by hand."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Disallow changing archived reservations."""
+        return False
@@ -6,3 +6,7 @@ class RoomReservationConfig(AppConfig):
 
     name = "room_reservation"
     verbose_name = "Room Reservation"
+
+    def ready(self):
+        """Connect the signal receivers."""
+        from . import signals  # noqa: F401
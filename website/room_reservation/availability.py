@@ -0,0 +1,98 @@
+"""
+Search for free time slots in rooms.
+
+All functions work on reservations that are already fetched, so the availability of every room in a time range is
+computed from a single query, in time linear in the number of reservations (after sorting them).
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .policies import DEFAULT_POLICY
+
+
+def opening_hours(start, end, policy=DEFAULT_POLICY):
+    """Return the (start, end) intervals within the range from start to end in which a policy allows reservations."""
+    intervals = []
+    date = timezone.localtime(start).date()
+    while date <= timezone.localtime(end).date():
+        if date.weekday() in policy.weekdays:
+            opening = max(start, timezone.make_aware(datetime.combine(date, policy.opening_time)))
+            closing = min(end, timezone.make_aware(datetime.combine(date, policy.last_minute)))
+            if opening < closing:
+                intervals.append((opening, closing))
+        date += timedelta(days=1)
+    return intervals
+
+
+def max_simultaneous(intervals):
+    """Return the maximum number of the (start, end, ...) intervals that overlap at any moment."""
+    start_times = sorted(interval[0] for interval in intervals)
+    end_times = sorted(interval[1] for interval in intervals)
+
+    i = 0
+    j = 0
+    simultaneous = 0
+    maximum = 0
+    while i < len(start_times):
+        if start_times[i] < end_times[j]:
+            simultaneous += 1
+            maximum = max(maximum, simultaneous)
+            i += 1
+        else:
+            simultaneous -= 1
+            j += 1
+    return maximum
+
+
+def busy_intervals(reservations, capacity):
+    """
+    Return the sorted (start, end) intervals in which a room is full or blocked.
+
+    `reservations` contains the (start_time, end_time, block_whole_room) of the reservations in the room.
+    """
+    changes = []
+    for start, end, blocked in reservations:
+        changes.append((start, 1, blocked))
+        changes.append((end, -1, blocked))
+    # At equal times, reservations that end are processed before reservations that start, as they do not overlap.
+    changes.sort(key=lambda change: (change[0], change[1]))
+
+    intervals = []
+    simultaneous = 0
+    blocking = 0
+    busy_since = None
+    for moment, change, blocked in changes:
+        simultaneous += change
+        if blocked:
+            blocking += change
+        busy = blocking > 0 or simultaneous >= capacity
+        if busy and busy_since is None:
+            busy_since = moment
+        elif not busy and busy_since is not None:
+            if busy_since < moment:
+                intervals.append((busy_since, moment))
+            busy_since = None
+    return intervals
+
+
+def free_slots(open_intervals, busy, duration):
+    """Return the parts of the sorted open intervals that are not busy and last at least duration."""
+    slots = []
+    i = 0
+    for start, end in open_intervals:
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        j = i
+        while start < end:
+            if j < len(busy) and busy[j][0] < end:
+                free_until = max(start, busy[j][0])
+                if free_until - start >= duration:
+                    slots.append((start, free_until))
+                start = max(start, busy[j][1])
+                j += 1
+            else:
+                if end - start >= duration:
+                    slots.append((start, end))
+                break
+    return slots
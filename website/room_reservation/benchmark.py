@@ -0,0 +1,311 @@
+"""
+Benchmark of the reservation endpoints.
+
+`seed` fills the database with generated users, rooms and reservations. `Benchmark` requests the endpoints through
+the Django test client and measures the latency and the number of queries of every request, and `HttpBenchmark`
+requests the read-only endpoints of a running server (like a local uWSGI) over HTTP instead. `HttpBenchmark` can also
+count how many change streams a server keeps open at once, which shows how many long-lived connections it handles.
+
+Every scenario has a budget of queries per request and a threshold for the 95th percentile of the latency in
+milliseconds, which `manage.py benchmark` checks. The query budgets assume a cache that does not use the database.
+"""
+import random
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import rooms
+from .models import Reservation, Room
+from .signals import invalidate_events
+
+# The query budget and the p95 latency threshold (in milliseconds) of every scenario.
+BUDGETS = {
+    "calendar": (0, 50),
+    "events": (1, 500),
+    "events_cached": (0, 50),
+    "availability": (1, 500),
+    "create": (13, 100),
+    "update": (15, 100),
+}
+
+
+def weekdays(start, end):
+    """Return the weekdays from start up to and including end."""
+    return [
+        start + timedelta(days=day)
+        for day in range((end - start).days + 1)
+        if (start + timedelta(days=day)).weekday() not in (5, 6)
+    ]
+
+
+def seed(users=200, rooms_count=100, reservations=100000, days=365, chunk_size=5000, rng=None):
+    """
+    Fill the database with users, rooms and reservations of an hour or two on the weekdays of the past days.
+
+    The reservations are inserted in bulk, so neither the occupancy rollup and slots nor the change streams are
+    updated. Run `manage.py rebuild_occupancy` and `rebuild_slots` to count them.
+    """
+    rng = rng or random.Random(0)
+    today = timezone.localdate()
+    dates = weekdays(today - timedelta(days=days), today - timedelta(days=1))
+
+    get_user_model().objects.bulk_create(
+        [get_user_model()(username=f"benchmark{i}", first_name="Benchmark", last_name=str(i)) for i in range(users)],
+        batch_size=chunk_size,
+    )
+    Room.objects.bulk_create(
+        [Room(name=f"Benchmark {i}", capacity=rng.randint(1, 10)) for i in range(rooms_count)], batch_size=chunk_size
+    )
+    user_ids = list(get_user_model().objects.values_list("pk", flat=True))
+    room_ids = list(Room.objects.values_list("pk", flat=True))
+
+    for offset in range(0, reservations, chunk_size):
+        chunk = []
+        for _ in range(min(chunk_size, reservations - offset)):
+            start = timezone.make_aware(datetime.combine(rng.choice(dates), time(rng.randint(8, 15))))
+            chunk.append(
+                Reservation(
+                    reservee_id=rng.choice(user_ids),
+                    room_id=rng.choice(room_ids),
+                    start_time=start,
+                    end_time=start + timedelta(hours=rng.randint(1, 2)),
+                    block_whole_room=rng.random() < 0.01,
+                )
+            )
+        Reservation.objects.bulk_create(chunk)
+
+    rooms.invalidate()
+    invalidate_events()
+
+
+def percentile(latencies, percent):
+    """Return the given percentile of the latencies."""
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method="inclusive")[percent - 1]
+
+
+class Benchmark:
+    """Benchmark of the endpoints through the Django test client."""
+
+    scenarios = ("calendar", "events", "events_cached", "availability", "create", "update")
+
+    def __init__(self, count=50, rng=None):
+        """Prepare a benchmark of count requests per scenario."""
+        self.count = count
+        self.rng = rng or random.Random(0)
+        self.users = list(get_user_model().objects.order_by("pk"))
+        self.rooms = list(Room.objects.values_list("pk", flat=True))
+        self.dates = weekdays(timezone.localdate() + timedelta(days=1), timezone.localdate() + timedelta(weeks=1))
+        self.created = []
+
+    def run(self, scenarios=None):
+        """Run the scenarios and return the results of each, in order."""
+        return [self.measure(name) for name in scenarios or self.scenarios]
+
+    def measure(self, name):
+        """Run a scenario and return its latency percentiles (in milliseconds) and maximum number of queries."""
+        # The first request only warms the caches of the process.
+        getattr(self, name)(self.count)()
+        latencies = []
+        max_queries = 0
+        for i in range(self.count):
+            request = getattr(self, name)(i)
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = request()
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                latencies.append((perf_counter() - start) * 1000)
+            if response.status_code not in (200, 304):
+                raise AssertionError(f"{name} responded with status {response.status_code}")
+            max_queries = max(max_queries, len(queries))
+        return self.result(name, latencies, max_queries)
+
+    def result(self, name, latencies, queries):
+        """Return the result of a scenario."""
+        return {
+            "name": name,
+            "requests": len(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "queries": queries,
+        }
+
+    def client(self, i):
+        """Return a client that is logged in as one of the users, a different one for every request."""
+        client = Client()
+        client.force_login(self.users[i % len(self.users)])
+        return client
+
+    def moment(self, hour):
+        """Return a random moment on the given hour of a day on which reservations can be made."""
+        return timezone.make_aware(datetime.combine(self.rng.choice(self.dates), time(hour)))
+
+    def range_params(self):
+        """Return the query parameters of a random week in the past year."""
+        start = timezone.localdate() - timedelta(weeks=self.rng.randint(0, 51))
+        start -= timedelta(days=start.weekday())
+        return {"start": start.isoformat(), "end": (start + timedelta(weeks=1)).isoformat()}
+
+    def calendar(self, i):
+        """Render the calendar page."""
+        rooms.get_rooms()
+        client = Client()
+        return lambda: client.get(reverse("room_reservation:calendar"))
+
+    def events(self, i):
+        """Fetch the events of a week that is not cached."""
+        cache.clear()
+        params = self.range_params()
+        client = Client()
+        return lambda: client.get(reverse("room_reservation:events"), params)
+
+    def events_cached(self, i):
+        """Revalidate the events of a week that did not change."""
+        params = self.range_params()
+        client = Client()
+        etag = client.get(reverse("room_reservation:events"), params)["ETag"]
+        return lambda: client.get(reverse("room_reservation:events"), params, HTTP_IF_NONE_MATCH=etag)
+
+    def availability(self, i):
+        """Search the free slots of an hour in all rooms in the coming week."""
+        rooms.get_rooms()
+        params = {
+            "from": self.dates[0].isoformat(),
+            "to": (self.dates[-1] + timedelta(days=1)).isoformat(),
+            "duration": 60,
+        }
+        client = Client()
+        return lambda: client.get(reverse("room_reservation:availability"), params)
+
+    def create(self, i):
+        """Make a reservation."""
+        client = self.client(i)
+        start = self.moment(self.rng.randint(8, 16))
+        data = {"room": self.rng.choice(self.rooms), "start_time": start, "end_time": start + timedelta(hours=1)}
+
+        def request():
+            response = client.post(
+                reverse("room_reservation:create_reservation"), data, content_type="application/json"
+            )
+            if response.json()["ok"]:
+                self.created.append((i, response.json()["pk"], data["room"]))
+            return response
+
+        return request
+
+    def update(self, i):
+        """Move a reservation made in the create scenario, or make a reservation if there are none left."""
+        if not self.created:
+            return self.create(i)
+        user, pk, room = self.created.pop()
+        client = self.client(user)
+        start = self.moment(self.rng.randint(8, 16))
+        data = {"room": room, "start_time": start, "end_time": start + timedelta(hours=1)}
+        return lambda: client.post(
+            reverse("room_reservation:update_reservation", kwargs={"pk": pk}), data, content_type="application/json"
+        )
+
+
+class HttpBenchmark(Benchmark):
+    """
+    Benchmark of the read-only endpoints of a running server, which cannot count its queries.
+
+    The server should use the same database, filled by `manage.py seed_reservations`.
+    """
+
+    scenarios = ("calendar", "events", "events_cached", "availability")
+
+    def __init__(self, url, count=50, rng=None):
+        """Prepare a benchmark of count requests per scenario to the server at url."""
+        super().__init__(count, rng)
+        self.url = url.rstrip("/")
+
+    def measure(self, name):
+        """Run a scenario and return its latency percentiles (in milliseconds), without the number of queries."""
+        import requests
+
+        session = requests.Session()
+        latencies = []
+        for _ in range(self.count):
+            path, params, headers = getattr(self, f"http_{name}")(session)
+            start = perf_counter()
+            response = session.get(self.url + path, params=params, headers=headers)
+            latencies.append((perf_counter() - start) * 1000)
+            if response.status_code not in (200, 304):
+                raise AssertionError(f"{name} responded with status {response.status_code}")
+        return self.result(name, latencies, None)
+
+    def connections(self, count, timeout=5):
+        """Open count change streams at once and return how many of them the server started within timeout seconds."""
+        import requests
+
+        path, params = reverse("room_reservation:stream"), self.range_params()
+        # Streams are only closed once all streams are opened or timed out, so they are all open at the same time.
+        opened = threading.Barrier(count)
+
+        def wait():
+            try:
+                opened.wait(timeout * 2)
+            except threading.BrokenBarrierError:
+                pass
+
+        def open_stream(_):
+            try:
+                with requests.get(self.url + path, params=params, stream=True, timeout=timeout) as response:
+                    started = next(response.iter_content(chunk_size=None), b"").startswith(b"retry:")
+                    wait()
+                    return started
+            except requests.RequestException:
+                wait()
+                return False
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return sum(executor.map(open_stream, range(count)))
+
+    def http_calendar(self, session):
+        """Render the calendar page."""
+        return reverse("room_reservation:calendar"), {}, {}
+
+    def http_events(self, session):
+        """Fetch the events of a week, which is likely not cached."""
+        return reverse("room_reservation:events"), self.range_params(), {}
+
+    def http_events_cached(self, session):
+        """Revalidate the events of a week that did not change."""
+        path, params = reverse("room_reservation:events"), self.range_params()
+        etag = session.get(self.url + path, params=params).headers["ETag"]
+        return path, params, {"If-None-Match": etag}
+
+    def http_availability(self, session):
+        """Search the free slots of an hour in all rooms in the coming week."""
+        params = {
+            "from": self.dates[0].isoformat(),
+            "to": (self.dates[-1] + timedelta(days=1)).isoformat(),
+            "duration": 60,
+        }
+        return reverse("room_reservation:availability"), params, {}
+
+
+def regressions(results, latency=True):
+    """Return a description of every result that exceeds its query budget or latency threshold."""
+    exceeded = []
+    for result in results:
+        max_queries, max_p95 = BUDGETS[result["name"]]
+        if result["queries"] is not None and result["queries"] > max_queries:
+            exceeded.append(f"{result['name']} made {result['queries']} queries (budget {max_queries})")
+        if latency and result["p95"] > max_p95:
+            exceeded.append(f"{result['name']} took {result['p95']:.1f} ms at p95 (threshold {max_p95} ms)")
+    return exceeded
@@ -0,0 +1,261 @@
+"""
+Publishing and streaming of reservation changes.
+
+The reservation views publish their changes after the transaction commits, and a broker delivers them to the open
+change streams. The broker is configured by the `RESERVATION_BROKER` setting: `LocalBroker` only reaches the streams
+of the current process, which is enough for development and tests, while `PostgresBroker` uses LISTEN/NOTIFY to reach
+the streams of all processes. Under ASGI, `AsyncStream` waits for changes in the event loop instead of in a thread.
+"""
+import asyncio
+import json
+import logging
+import queue
+import select
+import threading
+from functools import lru_cache
+from time import monotonic, sleep
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import dateparse
+from django.utils.module_loading import import_string
+
+from . import events, rooms
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "room_reservation_changes"
+
+
+class LocalBroker:
+    """Broker that delivers changes to the subscribers in the current process."""
+
+    def __init__(self):
+        """Create a broker without subscribers."""
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def publish(self, change):
+        """Publish a change to all subscribers."""
+        self.deliver(change)
+
+    def deliver(self, change):
+        """Deliver a change to the subscribers in this process."""
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.put(change)
+
+    def subscribe(self, subscriber=None):
+        """
+        Return a new queue that receives all changes published from now on.
+
+        Instead of a new queue, any subscriber with a `put` method can be given.
+        """
+        if subscriber is None:
+            subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Stop delivering changes to a queue returned by subscribe."""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Broker that publishes changes with Postgres NOTIFY.
+
+    Each process listens with a single connection in a background thread, which is started on the first subscription
+    and delivers the notifications to the subscribers in the process.
+    """
+
+    def __init__(self):
+        """Create a broker without subscribers, that is not listening yet."""
+        super().__init__()
+        self.listener = None
+
+    def publish(self, change):
+        """Publish a change to the subscribers in all processes."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(change, cls=DjangoJSONEncoder)])
+
+    def subscribe(self, subscriber=None):
+        """Start listening if needed and return a new queue that receives all changes published from now on."""
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name="reservation-changes", daemon=True)
+                self.listener.start()
+        return super().subscribe(subscriber)
+
+    def listen(self):
+        """Deliver the notifications of all processes, reconnecting when the connection is lost."""
+        while True:
+            listener = None
+            try:
+                listener = connection.get_new_connection(connection.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                while True:
+                    if select.select([listener], [], [], 60)[0]:
+                        listener.poll()
+                        while listener.notifies:
+                            self.notify(listener.notifies.pop(0).payload)
+            except Exception:
+                # Any error would end this thread and with it the changes of all streams in this process.
+                logger.exception("Listening for reservation changes failed")
+                sleep(1)
+            finally:
+                if listener is not None:
+                    listener.close()
+
+    def notify(self, payload):
+        """Deliver the change in a notification, logging invalid notifications instead of raising."""
+        try:
+            self.deliver(json.loads(payload))
+        except Exception:
+            logger.exception("Delivering reservation change %r failed", payload[:200])
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the broker of this process."""
+    return import_string(settings.RESERVATION_BROKER)()
+
+
+def publish(action, reservation, reservee):
+    """
+    Publish that a reservation of reservee is created, updated or deleted once the transaction commits.
+
+    Changes of created and updated reservations contain the reservation as a calendar event.
+    """
+    change = {"action": action, "pk": reservation.pk, "reservee_id": reservee.pk, "event": None}
+    if action != "delete":
+        room = rooms.get_room(reservation.room_id)
+        change["event"] = events.serialize(
+            {
+                "pk": reservation.pk,
+                "reservee_id": reservee.pk,
+                "reservee__first_name": reservee.first_name,
+                "reservee__last_name": reservee.last_name,
+                "room_id": reservation.room_id,
+                "room__name": room.name if room is not None else "",
+                "start_time": reservation.start_time,
+                "end_time": reservation.end_time,
+                "block_whole_room": reservation.block_whole_room,
+                "series_id": reservation.series_id,
+            }
+        )
+    transaction.on_commit(lambda: get_broker().publish(change))
+
+
+class Stream:
+    """
+    Server-sent events with the changes of the reservations that overlap a time range, optionally in one room.
+
+    Updates of reservations that moved out of the range are sent as deletes. A comment is sent every `keepalive`
+    seconds without changes, and the stream ends after `lifetime` seconds, after which the browser reconnects.
+    """
+
+    keepalive = 15
+    lifetime = 300
+
+    def __init__(self, start, end, room=None, user_id=None):
+        """Subscribe to the changes, so no change is missed between returning the response and streaming it."""
+        self.start = start
+        self.end = end
+        self.room = room
+        self.user_id = user_id
+        self.broker = get_broker()
+        self.subscriber = self.broker.subscribe(self.create_subscriber())
+
+    def create_subscriber(self):
+        """Return the queue that receives the changes."""
+        return queue.Queue()
+
+    def __iter__(self):
+        """Yield the server-sent events."""
+        deadline = monotonic() + self.lifetime
+        # The stream does not query the database, so its connection is not kept open while streaming.
+        connection.close()
+        yield "retry: 5000\n\n"
+        while monotonic() < deadline:
+            try:
+                change = self.subscriber.get(timeout=min(self.keepalive, max(deadline - monotonic(), 0)))
+            except queue.Empty:
+                yield ":\n\n"
+                continue
+            yield from self.messages(change)
+
+    def messages(self, change):
+        """Yield the server-sent event for a change, if it is relevant to this stream."""
+        message = self.format(change)
+        if message is not None:
+            yield f"event: change\ndata: {json.dumps(message)}\n\n"
+
+    def format(self, change):
+        """Return the message for a change, or None if it is not relevant to this stream."""
+        event = change["event"]
+        if event is not None and self.room is not None and event["room"] != self.room:
+            event = None
+        if event is not None:
+            start = dateparse.parse_datetime(event["start"])
+            end = dateparse.parse_datetime(event["end"])
+            if not (start < self.end and end > self.start):
+                event = None
+
+        if event is None:
+            if change["action"] == "create":
+                return None
+            return {"action": "delete", "pk": change["pk"]}
+        editable = self.user_id == change["reservee_id"]
+        return {"action": change["action"], "pk": change["pk"], "event": {**event, "editable": editable}}
+
+    def close(self):
+        """Stop receiving changes."""
+        self.broker.unsubscribe(self.subscriber)
+
+
+class AsyncSubscriber:
+    """Subscriber that passes the changes delivered by the broker thread to an asyncio queue."""
+
+    def __init__(self):
+        """Create a subscriber for the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def put(self, change):
+        """Put a change in the queue, from any thread."""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, change)
+
+
+class AsyncStream(Stream):
+    """
+    Stream that is iterated asynchronously, so waiting for changes does not occupy a thread.
+
+    It must be created in the event loop that iterates it.
+    """
+
+    def create_subscriber(self):
+        """Return a subscriber that receives the changes in the running event loop."""
+        return AsyncSubscriber()
+
+    async def __aiter__(self):
+        """Yield the server-sent events."""
+        deadline = monotonic() + self.lifetime
+        try:
+            yield "retry: 5000\n\n"
+            while monotonic() < deadline:
+                timeout = min(self.keepalive, max(deadline - monotonic(), 0))
+                try:
+                    change = await asyncio.wait_for(self.subscriber.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield ":\n\n"
+                    continue
+                for message in self.messages(change):
+                    yield message
+        finally:
+            self.close()
@@ -0,0 +1,182 @@
+"""
+Serialization and caching of reservations as calendar events.
+
+Reservations are cached per week (Monday 00:00 local time) and optionally per room. All cache keys contain a version
+number that is bumped whenever a reservation changes, so stale weeks are never served and simply expire. They are
+serialized as calendar events in the verbose format, or in a compact format that leaves building the titles to the
+client.
+"""
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Reservation
+
+VERSION_KEY = "room_reservation:version"
+EVENTS_TIMEOUT = 60 * 60 * 24
+CHUNK_SIZE = 2000
+COMPACT_MEDIA_TYPE = "application/vnd.sagexit.compact+json"
+
+EVENT_FIELDS = (
+    "pk",
+    "reservee_id",
+    "reservee__first_name",
+    "reservee__last_name",
+    "room_id",
+    "room__name",
+    "start_time",
+    "end_time",
+    "block_whole_room",
+    "series_id",
+)
+
+
+def get_version(key=VERSION_KEY):
+    """Return the current version of the reservations, or of another version key."""
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time so a lost version key never resurrects payloads of an old version.
+        cache.add(key, int(timezone.now().timestamp()), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key=VERSION_KEY):
+    """Invalidate all cached events, or everything else versioned by key, by bumping the version."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(timezone.now().timestamp()), None)
+
+
+def serialize(reservation):
+    """Convert a reservation projection with `EVENT_FIELDS` to a calendar event."""
+    reservee = f"{reservation['reservee__first_name']} {reservation['reservee__last_name']}".strip()
+    return {
+        "pk": reservation["pk"],
+        "title": f"{reservee} ({reservation['room__name']})"
+        if not reservation["block_whole_room"]
+        else f"{reservation['room__name']} BLOCKED",
+        "reservee": reservee,
+        "room": reservation["room_id"],
+        "start": reservation["start_time"].isoformat(),
+        "end": reservation["end_time"].isoformat(),
+        "series": reservation["series_id"],
+    }
+
+
+def week_start(moment):
+    """Return the start of the week that contains moment."""
+    date = timezone.localtime(moment).date()
+    return timezone.make_aware(datetime.combine(date - timedelta(days=date.weekday()), time()))
+
+
+def next_week(week):
+    """Return the start of the week after week, taking daylight saving time into account."""
+    return timezone.make_aware(datetime.combine(timezone.localtime(week).date() + timedelta(weeks=1), time()))
+
+
+def weeks_between(start, end):
+    """Return the starts of all weeks that overlap the range from start to end."""
+    weeks = []
+    week = week_start(start)
+    while week < end:
+        weeks.append(week)
+        week = next_week(week)
+    return weeks
+
+
+def get_week_events(weeks, room=None, version=None):
+    """
+    Return the reservations overlapping the given weeks as projections with `EVENT_FIELDS`, ordered by week.
+
+    Weeks that are not cached yet are loaded with a single query.
+    """
+    if version is None:
+        version = get_version()
+    keys = {week: f"room_reservation:events:{version}:{room or 'all'}:{week.date().isoformat()}" for week in weeks}
+    cached = cache.get_many(keys.values())
+
+    missing = [week for week in weeks if keys[week] not in cached]
+    if missing:
+        buckets = {week: [] for week in missing}
+        ends = {week: next_week(week) for week in missing}
+        reservations = Reservation.objects.filter(start_time__lt=ends[missing[-1]], end_time__gt=missing[0]).order_by(
+            "start_time", "pk"
+        )
+        if room is not None:
+            reservations = reservations.filter(room_id=room)
+        for reservation in reservations.values(*EVENT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+            for week in missing:
+                if reservation["start_time"] < ends[week] and reservation["end_time"] > week:
+                    buckets[week].append(reservation)
+        fetched = {keys[week]: reservations for week, reservations in buckets.items()}
+        cache.set_many(fetched, EVENTS_TIMEOUT)
+        cached.update(fetched)
+
+    seen = set()
+    reservations = []
+    for week in weeks:
+        for reservation in cached[keys[week]]:
+            if reservation["pk"] not in seen:
+                seen.add(reservation["pk"])
+                reservations.append(reservation)
+    return reservations
+
+
+def verbose(reservations, user_id):
+    """Yield the reservations as calendar events, which are editable if they are reserved by user_id."""
+    for reservation in reservations:
+        yield {**serialize(reservation), "editable": reservation["reservee_id"] == user_id}
+
+
+def compact(reservations, user_id):
+    """
+    Yield the parts of the reservations encoded in the compact format.
+
+    This is a JSON object with `events`, which contains an array for each reservation, and `users`, which maps the
+    reservee ids to their names. The array of a reservation consists of its primary key, the reservee id, the room
+    id, the start time in minutes since the epoch, the duration in minutes, whether the room is blocked, whether it is
+    editable and the series id (or null).
+    """
+    users = {}
+
+    def encode():
+        for reservation in reservations:
+            users[
+                reservation["reservee_id"]
+            ] = f"{reservation['reservee__first_name']} {reservation['reservee__last_name']}".strip()
+            start = int(reservation["start_time"].timestamp()) // 60
+            yield [
+                reservation["pk"],
+                reservation["reservee_id"],
+                reservation["room_id"],
+                start,
+                int(reservation["end_time"].timestamp()) // 60 - start,
+                reservation["block_whole_room"],
+                reservation["reservee_id"] == user_id,
+                reservation["series_id"],
+            ]
+
+    yield '{"events":'
+    yield from json_array(encode())
+    yield f',"users":{json.dumps(users)}}}'
+
+
+def json_array(items, chunk_size=500):
+    """Yield the items encoded as a JSON array, in parts of chunk_size items, without encoding all items at once."""
+    separator = "["
+    chunk = []
+    for item in items:
+        chunk.append(json.dumps(item, cls=DjangoJSONEncoder))
+        if len(chunk) == chunk_size:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+        separator = ","
+    yield "]" if separator == "," else "[]"
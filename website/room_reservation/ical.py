@@ -0,0 +1,119 @@
+"""
+iCalendar feeds of reservations, for calendar apps.
+
+There is a feed with the reservations of every user and a feed with the reservations in every room. Feeds are
+accessed with a signed token, which identifies the feed and the user it was given to, and cannot be guessed. The token
+also contains the feed key of that user (see `CalendarFeed`), so a user revokes all their links by replacing the key.
+"""
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import CalendarFeed, feed_key
+
+SALT = "room_reservation.ical"
+FEEDS = ("user", "room")
+
+
+def key_cache_key(user_id):
+    """Return the cache key of the feed key of a user."""
+    return f"room_reservation:ical:key:{user_id}"
+
+
+def get_key(user_id):
+    """Return the feed key of a user, or None if the user has none."""
+    key = cache.get(key_cache_key(user_id))
+    if key is None:
+        key = CalendarFeed.objects.filter(user_id=user_id).values_list("key", flat=True).first()
+        if key is not None:
+            cache.set(key_cache_key(user_id), key, None)
+    return key
+
+
+def get_or_create_key(user_id):
+    """Return the feed key of a user, which is created if the user has none."""
+    return get_key(user_id) or CalendarFeed.objects.get_or_create(user_id=user_id)[0].key
+
+
+def replace_key(user_id):
+    """Replace the feed key of a user, which revokes all tokens given to the user, and return the new key."""
+    key = feed_key()
+    CalendarFeed.objects.update_or_create(user_id=user_id, defaults={"key": key})
+    cache.set(key_cache_key(user_id), key, None)
+    return key
+
+
+def token(feed, pk, user_id, key):
+    """Return the token of the feed of the user or room with primary key pk, given to a user with feed key key."""
+    return signing.Signer(salt=SALT).sign(f"{feed}-{pk}-{user_id}-{key}")
+
+
+def unsign(value):
+    """
+    Return the feed and primary key identified by a token, or raise BadSignature if it is invalid.
+
+    Tokens with another key than the current feed key of their user are revoked, and also invalid.
+    """
+    parts = signing.Signer(salt=SALT).unsign(value).split("-")
+    if len(parts) != 4:
+        raise signing.BadSignature("Invalid feed")
+    feed, pk, user_id, key = parts
+    if feed not in FEEDS or not pk.isdigit() or not user_id.isdigit():
+        raise signing.BadSignature("Invalid feed")
+    if key != get_key(int(user_id)):
+        raise signing.BadSignature("Revoked feed")
+    return feed, int(pk)
+
+
+def escape(text):
+    """Escape a text value."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def fold(line):
+    """Fold a content line into lines of at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Never split a multi-byte character.
+        while size < len(encoded) and encoded[size] & 0xC0 == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return "\r\n ".join(parts)
+
+
+def moment(value):
+    """Format a datetime in UTC."""
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def calendar(name, events, host):
+    """
+    Return an iCalendar document.
+
+    `events` contains the primary key, summary, start time and end time of each reservation.
+    """
+    stamp = moment(timezone.now())
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Sagexit//Reservations//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    for pk, summary, start, end in events:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:reservation-{pk}@{host}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{moment(start)}",
+            f"DTEND:{moment(end)}",
+            f"SUMMARY:{escape(summary)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "".join(f"{fold(line)}\r\n" for line in lines)
@@ -0,0 +1,72 @@
+"""
+Idempotency keys for the reservation write endpoints.
+
+A client can send an `Idempotency-Key` header with a random key that is unique to the change it makes, and send the
+same key when it retries the request. The first response is stored in the cache for `TIMEOUT` seconds, and retries
+get the stored response back without validating or writing anything again. Keys are scoped per user and can only be
+reused for the same request.
+"""
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+TIMEOUT = 60 * 60 * 24
+# The time a request may take before a retry handles it again, in case the first one never finished.
+PENDING_TIMEOUT = 60
+MAX_KEY_LENGTH = 255
+
+
+class IdempotentMixin:
+    """Mixin for write endpoints that replays the stored response to requests with an `Idempotency-Key`."""
+
+    def dispatch(self, request, *args, **kwargs):
+        """Handle the request, or replay the stored response if the key was used before."""
+        key = request.META.get(HEADER)
+        if request.method != "POST" or not key or not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Idempotency-Key is too long"}))
+
+        cache_key = f"room_reservation:idempotency:{request.user.pk}:{md5(key.encode()).hexdigest()}"
+        fingerprint = md5(request.path.encode() + b"\n" + request.body).hexdigest()
+        if not cache.add(cache_key, {"fingerprint": fingerprint, "response": None}, PENDING_TIMEOUT):
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return self.replay(stored, fingerprint)
+            # The entry expired in the meantime, so this request is handled like a new one.
+            cache.set(cache_key, {"fingerprint": fingerprint, "response": None}, PENDING_TIMEOUT)
+
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            # Failures are not stored, so a retry can succeed.
+            cache.delete(cache_key)
+            return response
+
+        stored = {
+            "fingerprint": fingerprint,
+            "response": (response.status_code, response["Content-Type"], response.content),
+        }
+        cache.set(cache_key, stored, TIMEOUT)
+        return response
+
+    def replay(self, stored, fingerprint):
+        """Return the stored response, or an error if it is for another request or not finished yet."""
+        if stored["fingerprint"] != fingerprint:
+            return JsonResponse(
+                {"ok": False, "message": "This Idempotency-Key was used for another request"}, status=422
+            )
+        if stored["response"] is None:
+            return JsonResponse(
+                {"ok": False, "message": "A request with this Idempotency-Key is still being processed"}, status=409
+            )
+        status, content_type, content = stored["response"]
+        response = HttpResponse(content, status=status, content_type=content_type)
+        response["Idempotent-Replayed"] = "true"
+        return response
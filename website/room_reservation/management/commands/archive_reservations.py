@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from room_reservation import occupancy
+from room_reservation.models import ArchivedReservation, Reservation
+from room_reservation.signals import archiving
+
+ARCHIVED_FIELDS = ("pk", "reservee_id", "series_id", "room_id", "start_time", "end_time", "block_whole_room")
+
+
+class Command(BaseCommand):
+    """Move reservations that ended long ago to the archive."""
+
+    help = "Move reservations that ended long ago to the archive, keeping the reservation table small."
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.RESERVATION_ARCHIVE_DAYS,
+            help="Archive reservations that ended more than this many days ago",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of reservations per transaction")
+
+    def handle(self, *args, **options):
+        """Move the reservations in chunks, each in its own transaction, so locks are only held shortly."""
+        cutoff = timezone.now() - timezone.timedelta(days=options["days"])
+        archived = 0
+        while True:
+            with transaction.atomic(), archiving():
+                chunk = list(
+                    Reservation.objects.filter(end_time__lt=cutoff)
+                    .order_by("pk")
+                    .values_list(*ARCHIVED_FIELDS)[: options["chunk_size"]]
+                )
+                if not chunk:
+                    break
+                # A reservation that is already archived makes this fail, instead of deleting it without archiving it.
+                ArchivedReservation.objects.bulk_create(
+                    [ArchivedReservation(**dict(zip(ARCHIVED_FIELDS, reservation))) for reservation in chunk]
+                )
+                Reservation.objects.filter(pk__in=[reservation[0] for reservation in chunk]).delete()
+                # The last fields of ARCHIVED_FIELDS are the occupancy.STATE_FIELDS.
+                occupancy.record_slots(removed=[reservation[3:] for reservation in chunk])
+            archived += len(chunk)
+        self.stdout.write(f"Archived {archived} reservations that ended before {cutoff:%Y-%m-%d %H:%M}")
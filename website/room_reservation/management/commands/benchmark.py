@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from room_reservation import benchmark
+from room_reservation.models import Reservation
+
+
+class Command(BaseCommand):
+    """Benchmark the reservation endpoints and check their query budgets and latency thresholds."""
+
+    help = (
+        "Benchmark the reservation endpoints in a test database filled with generated data, or the read-only "
+        "endpoints of a running server with --url. Fails when a query budget or latency threshold is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("--users", type=int, default=200, help="Number of users")
+        parser.add_argument("--rooms", type=int, default=100, help="Number of rooms")
+        parser.add_argument("--reservations", type=int, default=100000, help="Number of reservations")
+        parser.add_argument("--days", type=int, default=365, help="Number of past days with reservations")
+        parser.add_argument("--requests", type=int, default=50, help="Number of requests per scenario")
+        parser.add_argument("--scenario", action="append", dest="scenarios", help="Only run this scenario")
+        parser.add_argument("--url", help="Benchmark the server at this url, which uses the configured database")
+        parser.add_argument("--keepdb", action="store_true", help="Keep the test database and its data between runs")
+        parser.add_argument("--no-latency", action="store_true", help="Only check the query budgets")
+        parser.add_argument(
+            "--connections", type=int, help="With --url, only count how many of this many change streams stay open"
+        )
+
+    def handle(self, *args, **options):
+        """Run the benchmark and report the results."""
+        if options["connections"]:
+            if not options["url"]:
+                raise CommandError("--connections requires --url")
+            opened = benchmark.HttpBenchmark(options["url"]).connections(options["connections"])
+            self.stdout.write(f"{opened} of {options['connections']} change streams were open at once")
+            return
+
+        if options["url"]:
+            results = benchmark.HttpBenchmark(options["url"], options["requests"]).run(options["scenarios"])
+        else:
+            results = self.run_in_test_database(options)
+
+        self.stdout.write(f"{'scenario':<16}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}")
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<16}{result['requests']:>10}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                f"{result['p99']:>10.1f}{result['queries'] if result['queries'] is not None else '-':>10}"
+            )
+
+        exceeded = benchmark.regressions(results, latency=not options["no_latency"])
+        if exceeded:
+            raise CommandError("Budgets exceeded:\n" + "\n".join(exceeded))
+
+    def run_in_test_database(self, options):
+        """Fill a test database (unless it is kept and already filled) and benchmark the endpoints in it."""
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            if not Reservation.objects.exists():
+                benchmark.seed(options["users"], options["rooms"], options["reservations"], options["days"])
+            return benchmark.Benchmark(options["requests"]).run(options["scenarios"])
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
@@ -0,0 +1,66 @@
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+
+from room_reservation import transfer
+from room_reservation.models import ArchivedReservation, Reservation
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    """Export reservations to a CSV or JSON lines file."""
+
+    help = (
+        "Export reservations, ordered by start time, to a CSV or JSON lines file (or stdout). The reservations are "
+        "streamed from the database in chunks, so memory use does not grow with the number of reservations."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("--output", default="-", help="The file to write, or - for stdout (the default)")
+        parser.add_argument(
+            "--format", choices=transfer.FORMATS, help="The format of the file (default: by extension)"
+        )
+        parser.add_argument("--from", dest="start", help="Only export reservations that end after this time")
+        parser.add_argument("--to", dest="end", help="Only export reservations that start before this time")
+        parser.add_argument("--room", help="Only export the reservations in the room with this name")
+        parser.add_argument("--archived", action="store_true", help="Also export the archived reservations")
+
+    def handle(self, *args, **options):
+        """Write the reservations."""
+        try:
+            filters = {}
+            if options["start"]:
+                filters["end_time__gt"] = transfer.parse_datetime(options["start"])
+            if options["end"]:
+                filters["start_time__lt"] = transfer.parse_datetime(options["end"])
+        except ValueError as error:
+            raise CommandError(error)
+        if options["room"]:
+            filters["room__name"] = options["room"]
+
+        rows = (
+            Reservation.objects.filter(**filters)
+            .order_by("start_time", "pk")
+            .values_list(*transfer.EXPORT_FIELDS)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        if options["archived"]:
+            # Archived reservations ended before the reservations that are not archived.
+            archived = (
+                ArchivedReservation.objects.filter(**filters)
+                .order_by("start_time", "pk")
+                .values_list(*transfer.EXPORT_FIELDS)
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            rows = chain(archived, rows)
+
+        path = options["output"]
+        format = options["format"] or transfer.guess_format(path)
+        if path == "-":
+            count = transfer.write_rows(self.stdout, format, rows)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                count = transfer.write_rows(file, format, rows)
+        self.stderr.write(f"Exported {count} reservations")
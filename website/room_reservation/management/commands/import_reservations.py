@@ -0,0 +1,141 @@
+import sys
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from room_reservation import availability, occupancy, transfer
+from room_reservation.models import Reservation, Room
+from room_reservation.signals import bulk_changed
+
+
+class Command(BaseCommand):
+    """Import reservations from a CSV or JSON lines file."""
+
+    help = (
+        "Import reservations from a CSV or JSON lines file (or - for stdin), in chunks that each take one transaction. "
+        "Reservations that exceed the capacity of their room or overlap a blocking reservation are rejected, other "
+        "rules of the room policies are not checked, so past reservations can be imported."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("path", help="The file to import, or - to read from stdin")
+        parser.add_argument(
+            "--format", choices=transfer.FORMATS, help="The format of the file (default: by extension)"
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of reservations per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate the reservations")
+
+    def handle(self, *args, **options):
+        """Import the reservations chunk by chunk."""
+        path = options["path"]
+        format = options["format"] or transfer.guess_format(path)
+        imported = 0
+        rejected = 0
+        try:
+            file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as error:
+            raise CommandError(f"Cannot read {path}: {error}")
+        with file:
+            rows = transfer.read_rows(file, format)
+            while True:
+                chunk = list(islice(rows, options["chunk_size"]))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    created, errors = self.import_chunk(chunk, options["dry_run"])
+                imported += created
+                rejected += len(errors)
+                for line, message in errors:
+                    self.stderr.write(f"Line {line}: {message}")
+
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(f"{verb} {imported} reservations, rejected {rejected}")
+
+    def import_chunk(self, chunk, dry_run=False):
+        """
+        Validate and insert a chunk of rows and return the number of inserted reservations and the errors.
+
+        The rooms are locked and their reservations that overlap the chunk are fetched with a single query, after
+        which every row is validated against those and the rows before it.
+        """
+        errors = []
+        parsed = []
+        for line, row in chunk:
+            try:
+                parsed.append((line, *transfer.parse_row(row)))
+            except ValueError as error:
+                errors.append((line, str(error)))
+
+        users = get_user_model().objects.in_bulk({row[1] for row in parsed}, field_name="username")
+        rooms = {}
+        for room in Room.objects.filter(name__in={row[2] for row in parsed}):
+            rooms.setdefault(room.name, []).append(room)
+
+        reservations = []
+        for line, username, room_name, start_time, end_time, blocked in parsed:
+            if username not in users:
+                errors.append((line, f"Unknown user: {username}"))
+            elif len(rooms.get(room_name, [])) != 1:
+                errors.append((line, f"Unknown or ambiguous room: {room_name}"))
+            elif start_time >= end_time:
+                errors.append((line, "Start time needs to be before end time"))
+            else:
+                reservation = Reservation(
+                    reservee=users[username],
+                    room=rooms[room_name][0],
+                    start_time=start_time,
+                    end_time=end_time,
+                    block_whole_room=blocked,
+                )
+                reservations.append((line, reservation))
+        if not reservations:
+            return 0, sorted(errors)
+
+        capacities = dict(
+            Room.objects.select_for_update()
+            .filter(pk__in={reservation.room_id for _, reservation in reservations})
+            .order_by("pk")
+            .values_list("pk", "capacity")
+        )
+        existing = defaultdict(list)
+        for room, *reservation in (
+            Reservation.objects.filter(
+                room_id__in=capacities,
+                start_time__lt=max(reservation.end_time for _, reservation in reservations),
+                end_time__gt=min(reservation.start_time for _, reservation in reservations),
+            )
+            .values_list(*occupancy.STATE_FIELDS)
+            .iterator()
+        ):
+            existing[room].append(tuple(reservation))
+
+        valid = []
+        for line, reservation in reservations:
+            message = self.check(reservation, capacities[reservation.room_id], existing[reservation.room_id])
+            if message is not None:
+                errors.append((line, message))
+                continue
+            existing[reservation.room_id].append(occupancy.state(reservation)[1:])
+            valid.append(reservation)
+
+        if valid and not dry_run:
+            Reservation.objects.bulk_create(valid)
+            bulk_changed(added=[occupancy.state(reservation) for reservation in valid])
+        return len(valid), sorted(errors)
+
+    def check(self, reservation, capacity, reservations):
+        """Return why a reservation cannot be added to the (start_time, end_time, block_whole_room) of its room."""
+        if reservation.block_whole_room:
+            return None
+        overlapping = [
+            other for other in reservations if other[0] < reservation.end_time and other[1] > reservation.start_time
+        ]
+        if any(blocked for _, _, blocked in overlapping):
+            return "This room is blocked."
+        if availability.max_simultaneous(overlapping) >= capacity:
+            return "Capacity is reached for this room"
+        return None
@@ -0,0 +1,39 @@
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from room_reservation import occupancy
+from room_reservation.models import ArchivedReservation, OccupancyRollup, Reservation
+
+
+class Command(BaseCommand):
+    """Rebuild the occupancy rollup from the reservations, including the archived ones."""
+
+    help = "Rebuild the occupancy rollup from the reservations, including the archived ones."
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Number of rows per query")
+
+    def handle(self, *args, **options):
+        """Recompute the occupancy of all hours in a single transaction."""
+        chunk_size = options["chunk_size"]
+        with transaction.atomic():
+            totals = occupancy.aggregate(
+                chain(
+                    Reservation.objects.values_list(*occupancy.STATE_FIELDS).iterator(chunk_size=chunk_size),
+                    ArchivedReservation.objects.values_list(*occupancy.STATE_FIELDS).iterator(chunk_size=chunk_size),
+                )
+            )
+            OccupancyRollup.objects.all().delete()
+            OccupancyRollup.objects.bulk_create(
+                (
+                    OccupancyRollup(
+                        room_id=room, date=date, hour=hour, seat_minutes=seat_minutes, blocked_minutes=blocked_minutes
+                    )
+                    for (room, date, hour), (seat_minutes, blocked_minutes) in totals.items()
+                ),
+                batch_size=chunk_size,
+            )
+        self.stdout.write(f"Rebuilt the occupancy of {len(totals)} hours")
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from room_reservation import occupancy
+from room_reservation.models import OccupancySlot, Reservation, Room
+
+
+class Command(BaseCommand):
+    """Rebuild the occupancy slots from the reservations, or verify them."""
+
+    help = (
+        "Rebuild the occupancy slots from the reservations. With --verify, only compare the slots with the "
+        "reservations and fail if they differ."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("--verify", action="store_true", help="Report wrong slots instead of rebuilding them")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Number of rows per query")
+
+    def handle(self, *args, **options):
+        """Recompute all slots in a single transaction, which locks the rooms so the reservations cannot change."""
+        chunk_size = options["chunk_size"]
+        with transaction.atomic():
+            list(Room.objects.select_for_update().order_by("pk").values_list("pk"))
+            totals = occupancy.count_slots(
+                Reservation.objects.values_list(*occupancy.STATE_FIELDS).iterator(chunk_size=chunk_size)
+            )
+            if options["verify"]:
+                self.verify(totals, chunk_size)
+                return
+
+            OccupancySlot.objects.all().delete()
+            OccupancySlot.objects.bulk_create(
+                (
+                    OccupancySlot(room_id=room, start=start, booked=booked, blocked=blocked)
+                    for (room, start), (booked, blocked) in totals.items()
+                ),
+                batch_size=chunk_size,
+            )
+        self.stdout.write(f"Rebuilt {len(totals)} slots")
+
+    def verify(self, totals, chunk_size):
+        """Compare the slots with the totals and raise CommandError if any differ."""
+        wrong = 0
+        for room, start, booked, blocked in (
+            OccupancySlot.objects.order_by("room_id", "start")
+            .values_list("room_id", "start", "booked", "blocked")
+            .iterator(chunk_size=chunk_size)
+        ):
+            expected = totals.pop((room, start), [0, 0])
+            if [booked, blocked] != expected:
+                wrong += 1
+                self.stderr.write(
+                    f"Room {room} at {start}: {booked} reservations, {blocked} blocking, expected {expected[0]}, {expected[1]}"
+                )
+        for (room, start), (booked, blocked) in sorted(totals.items()):
+            wrong += 1
+            self.stderr.write(f"Room {room} at {start}: missing, expected {booked} reservations, {blocked} blocking")
+        if wrong:
+            raise CommandError(f"{wrong} slots are wrong, run rebuild_slots to fix them")
+        self.stdout.write("All slots are correct")
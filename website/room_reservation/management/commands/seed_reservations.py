@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from room_reservation import benchmark
+
+
+class Command(BaseCommand):
+    """Fill the database with generated users, rooms and reservations."""
+
+    help = "Fill the database with generated users, rooms and reservations, to benchmark a running server."
+
+    def add_arguments(self, parser):
+        """Add the arguments of this command."""
+        parser.add_argument("--users", type=int, default=200, help="Number of users")
+        parser.add_argument("--rooms", type=int, default=100, help="Number of rooms")
+        parser.add_argument("--reservations", type=int, default=100000, help="Number of reservations")
+        parser.add_argument("--days", type=int, default=365, help="Number of past days with reservations")
+
+    def handle(self, *args, **options):
+        """Seed the database."""
+        benchmark.seed(options["users"], options["rooms"], options["reservations"], options["days"])
+        self.stdout.write(
+            f"Created {options['users']} users, {options['rooms']} rooms and {options['reservations']} reservations"
+        )
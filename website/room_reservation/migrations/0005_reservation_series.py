@@ -0,0 +1,41 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("room_reservation", "0004_reservation_block_whole_room"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationSeries",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("frequency", models.CharField(choices=[("daily", "Daily"), ("weekly", "Weekly")], max_length=10)),
+                ("until", models.DateField()),
+                (
+                    "reservee",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "reservation series",
+            },
+        ),
+        migrations.AddField(
+            model_name="reservation",
+            name="series",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="room_reservation.reservationseries",
+            ),
+        ),
+    ]
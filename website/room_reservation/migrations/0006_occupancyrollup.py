@@ -0,0 +1,69 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:07
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def count_hours(apps, schema_editor):
+    """Count the existing reservations in the rollup, which is updated incrementally from now on."""
+    Reservation = apps.get_model("room_reservation", "Reservation")
+    OccupancyRollup = apps.get_model("room_reservation", "OccupancyRollup")
+    seat_minutes = Counter()
+    blocked_minutes = Counter()
+    for room, start, end, block_whole_room in Reservation.objects.values_list(
+        "room_id", "start_time", "end_time", "block_whole_room"
+    ).iterator():
+        hour = timezone.localtime(start).replace(minute=0, second=0, microsecond=0)
+        while hour < end:
+            minutes = int((min(end, hour + timedelta(hours=1)) - max(start, hour)).total_seconds() // 60)
+            local = timezone.localtime(hour)
+            totals = blocked_minutes if block_whole_room else seat_minutes
+            totals[room, local.date(), local.hour] += minutes
+            hour += timedelta(hours=1)
+    OccupancyRollup.objects.bulk_create(
+        (
+            OccupancyRollup(
+                room_id=room,
+                date=date,
+                hour=hour,
+                seat_minutes=seat_minutes[room, date, hour],
+                blocked_minutes=blocked_minutes[room, date, hour],
+            )
+            for room, date, hour in set(seat_minutes) | set(blocked_minutes)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("room_reservation", "0005_reservation_series"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccupancyRollup",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("hour", models.SmallIntegerField()),
+                ("seat_minutes", models.IntegerField(default=0)),
+                ("blocked_minutes", models.IntegerField(default=0)),
+                ("room", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="room_reservation.room")),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="occupancyrollup",
+            index=models.Index(fields=["date", "hour"], name="room_reserv_date_2abaf2_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="occupancyrollup",
+            unique_together={("room", "date", "hour")},
+        ),
+        migrations.RunPython(count_hours, migrations.RunPython.noop),
+    ]
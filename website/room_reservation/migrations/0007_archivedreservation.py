@@ -0,0 +1,31 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("room_reservation", "0006_occupancyrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedReservation",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("start_time", models.DateTimeField()),
+                ("end_time", models.DateTimeField()),
+                ("block_whole_room", models.BooleanField(default=False)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "reservee",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+                ("room", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="room_reservation.room")),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("room_reservation", "0007_archivedreservation"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedreservation",
+            name="start_time",
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="reservation",
+            name="start_time",
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:31
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("room_reservation", "0008_start_time_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomPolicy",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=200)),
+                ("opening_time", models.TimeField(default=datetime.time(8, 0))),
+                (
+                    "closing_time",
+                    models.TimeField(
+                        default=datetime.time(18, 0), help_text="Reservations have to end before this time."
+                    ),
+                ),
+                ("open_in_weekends", models.BooleanField(default=False)),
+                (
+                    "horizon",
+                    models.PositiveSmallIntegerField(
+                        default=7, help_text="Number of days reservations can be made ahead."
+                    ),
+                ),
+                (
+                    "max_duration",
+                    models.DurationField(blank=True, help_text="Leave empty to allow whole days.", null=True),
+                ),
+                (
+                    "max_concurrent_reservations",
+                    models.PositiveSmallIntegerField(
+                        default=1, help_text="Number of reservations a user can have at the same time, in any room."
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "room policies",
+            },
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="policy",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Leave empty for the default policy.",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="room_reservation.roompolicy",
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:40
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+SLOT = timedelta(minutes=15)
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def count_slots(apps, schema_editor):
+    """Count the existing reservations in the slots, which are updated incrementally from now on."""
+    Reservation = apps.get_model("room_reservation", "Reservation")
+    OccupancySlot = apps.get_model("room_reservation", "OccupancySlot")
+    booked = Counter()
+    blocked = Counter()
+    for room, start, end, block_whole_room in Reservation.objects.values_list(
+        "room_id", "start_time", "end_time", "block_whole_room"
+    ).iterator():
+        slot = start - (start - EPOCH) % SLOT
+        while slot < end:
+            booked[room, slot] += 1
+            if block_whole_room:
+                blocked[room, slot] += 1
+            slot += SLOT
+    OccupancySlot.objects.bulk_create(
+        (
+            OccupancySlot(room_id=room, start=start, booked=count, blocked=blocked[room, start])
+            for (room, start), count in booked.items()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("room_reservation", "0009_roompolicy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OccupancySlot",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("start", models.DateTimeField()),
+                ("booked", models.IntegerField(default=0)),
+                ("blocked", models.IntegerField(default=0)),
+                ("room", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="room_reservation.room")),
+            ],
+            options={
+                "unique_together": {("room", "start")},
+            },
+        ),
+        migrations.RunPython(count_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("room_reservation", "0010_occupancyslot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedreservation",
+            name="series",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="room_reservation.reservationseries",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 11:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import room_reservation.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("room_reservation", "0011_archivedreservation_series"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CalendarFeed",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(default=room_reservation.models.feed_key, max_length=20)),
+                (
+                    "user",
+                    models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
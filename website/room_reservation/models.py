@@ -1,5 +1,34 @@
+from datetime import time
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.crypto import get_random_string
+
+
+class RoomPolicy(models.Model):
+    """
+    Model for the rules for reserving a room.
+
+    Rooms without a policy follow the defaults of these fields. Reservations have to start and end within the opening
+    hours of a single day.
+    """
+
+    name = models.CharField(max_length=200)
+    opening_time = models.TimeField(default=time(8))
+    closing_time = models.TimeField(default=time(18), help_text="Reservations have to end before this time.")
+    open_in_weekends = models.BooleanField(default=False)
+    horizon = models.PositiveSmallIntegerField(default=7, help_text="Number of days reservations can be made ahead.")
+    max_duration = models.DurationField(null=True, blank=True, help_text="Leave empty to allow whole days.")
+    max_concurrent_reservations = models.PositiveSmallIntegerField(
+        default=1, help_text="Number of reservations a user can have at the same time, in any room."
+    )
+
+    class Meta:
+        verbose_name_plural = "room policies"
+
+    def __str__(self):
+        """Return the name of the policy."""
+        return self.name
 
 
 class Room(models.Model):
@@ -7,21 +36,144 @@ class Room(models.Model):
 
     name = models.CharField(max_length=200)
     capacity = models.SmallIntegerField(blank=False, null=False)
+    policy = models.ForeignKey(
+        RoomPolicy, on_delete=models.SET_NULL, null=True, blank=True, help_text="Leave empty for the default policy."
+    )
 
     def __str__(self):
         """Return small description about the room."""
         return f"{self.name} (max. {self.capacity}p)"
 
 
+class ReservationSeries(models.Model):
+    """Model for a series of recurring reservations that are made and deleted together."""
+
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    FREQUENCY_CHOICES = ((DAILY, "Daily"), (WEEKLY, "Weekly"))
+
+    reservee = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    until = models.DateField()
+
+    class Meta:
+        verbose_name_plural = "reservation series"
+
+    def __str__(self):
+        """Return small description about the series."""
+        return f"{self.get_frequency_display()} reservations of {self.reservee} until {self.until}"
+
+
 class Reservation(models.Model):
     """Model for a reservation that is made by a reservee for a certain room, with an start and end date."""
 
     reservee = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
-    start_time = models.DateTimeField()
+    start_time = models.DateTimeField(db_index=True)
     end_time = models.DateTimeField()
     block_whole_room = models.BooleanField(null=False, blank=False, default=False)
+    series = models.ForeignKey(ReservationSeries, on_delete=models.CASCADE, null=True, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded values, so the occupancy of the old values can be removed when they change."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         """Return small description about the reservation."""
         return f"{self.reservee} has {self.room} reserved at {self.start_time} until {self.end_time}"
+
+
+class ArchivedReservation(models.Model):
+    """
+    Model for a reservation that ended long ago, moved out of the Reservation table by `manage.py archive_reservations`.
+
+    Archived reservations keep the primary key they had as a Reservation.
+    """
+
+    reservee = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    start_time = models.DateTimeField(db_index=True)
+    end_time = models.DateTimeField()
+    block_whole_room = models.BooleanField(default=False)
+    series = models.ForeignKey(ReservationSeries, on_delete=models.SET_NULL, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Return small description about the reservation."""
+        return f"{self.reservee} had {self.room} reserved at {self.start_time} until {self.end_time}"
+
+
+class OccupancyRollup(models.Model):
+    """
+    Model for the occupancy of a room during one hour of a day, aggregated from the reservations.
+
+    The minutes are summed over all reservations, so `seat_minutes / 60` is the average number of occupied seats.
+    """
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.SmallIntegerField()
+    seat_minutes = models.IntegerField(default=0)
+    blocked_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("room", "date", "hour")
+        indexes = [models.Index(fields=["date", "hour"])]
+
+    @property
+    def occupied_seats(self):
+        """Return the average number of occupied seats."""
+        return self.seat_minutes / 60
+
+    @property
+    def blocked(self):
+        """Return true if the room is blocked during (a part of) the hour."""
+        return self.blocked_minutes > 0
+
+    def __str__(self):
+        """Return small description about the occupancy."""
+        return f"{self.room} on {self.date} at {self.hour}:00: {self.occupied_seats:.1f} seats"
+
+
+class OccupancySlot(models.Model):
+    """
+    Model for the number of reservations in a room during a slot of 15 minutes, counted from the reservations.
+
+    Reservations count for every slot they overlap, even partially, so `booked` is an upper bound of the number of
+    simultaneous reservations during the slot. `blocked` counts the reservations that block the whole room.
+    """
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+    start = models.DateTimeField()
+    booked = models.IntegerField(default=0)
+    blocked = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("room", "start")
+
+    def __str__(self):
+        """Return small description about the slot."""
+        return f"{self.room} at {self.start}: {self.booked} reservations"
+
+
+def feed_key():
+    """Return a new random key for the calendar feeds of a user."""
+    return get_random_string(20)
+
+
+class CalendarFeed(models.Model):
+    """
+    Model for the key in the links to the calendar feeds of a user.
+
+    Replacing the key revokes all links of the user, for example when one is leaked.
+    """
+
+    user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE)
+    key = models.CharField(max_length=20, default=feed_key)
+
+    def __str__(self):
+        """Return small description about the feeds."""
+        return f"Calendar feeds of {self.user}"
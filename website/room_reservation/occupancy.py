@@ -0,0 +1,157 @@
+"""
+Occupancy of the rooms per hour, kept in the OccupancyRollup table, and per slot of 15 minutes, kept in the
+OccupancySlot table.
+
+The rollup is updated incrementally on every reservation change, so statistics over long periods only read the
+small rollup table instead of the reservations. `manage.py rebuild_occupancy` recomputes it from scratch.
+
+The slots are updated in the same transaction as the reservations, so a capacity check only has to read the maximum
+of a few slots. Only reservations in the Reservation table count in the slots, archived ones are removed.
+`manage.py rebuild_slots` recomputes them from scratch, or with `--verify` reports where they are wrong.
+
+Reservations are passed around as (room_id, start_time, end_time, block_whole_room) tuples.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OccupancyRollup, OccupancySlot, Reservation
+
+STATE_FIELDS = ("room_id", "start_time", "end_time", "block_whole_room")
+
+SLOT = timedelta(minutes=15)
+# Slots are aligned to quarters in UTC, which are quarters in every timezone with an offset of whole quarters.
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def state(reservation):
+    """Return the current state of the reservation."""
+    # Unsaved values can still be strings, so convert them like the database does.
+    return tuple(Reservation._meta.get_field(field).to_python(getattr(reservation, field)) for field in STATE_FIELDS)
+
+
+def loaded_state(reservation):
+    """Return the state of the reservation as it was loaded from the database, or None if it is unknown."""
+    loaded = getattr(reservation, "_loaded_values", {})
+    if not all(field in loaded for field in STATE_FIELDS):
+        return None
+    return tuple(loaded[field] for field in STATE_FIELDS)
+
+
+def hour_buckets(start, end):
+    """Yield the local (date, hour) and the number of minutes of all hours overlapping the range from start to end."""
+    hour = timezone.localtime(start).replace(minute=0, second=0, microsecond=0)
+    while hour < end:
+        minutes = int((min(end, hour + timedelta(hours=1)) - max(start, hour)).total_seconds() // 60)
+        local = timezone.localtime(hour)
+        yield (local.date(), local.hour), minutes
+        hour += timedelta(hours=1)
+
+
+def aggregate(reservations, totals=None, sign=1):
+    """Add the seat and blocked minutes of the reservations to the totals per (room, date, hour) and return them."""
+    if totals is None:
+        totals = defaultdict(lambda: [0, 0])
+    for room, start, end, blocked in reservations:
+        for (date, hour), minutes in hour_buckets(start, end):
+            totals[room, date, hour][1 if blocked else 0] += sign * minutes
+    return totals
+
+
+def record(added=(), removed=()):
+    """Add the occupancy of the added reservations and remove that of the removed ones, in the rollup and the slots."""
+    record_hours(added, removed)
+    record_slots(added, removed)
+
+
+def record_hours(added=(), removed=()):
+    """Add the occupancy of the added reservations to the rollup and remove that of the removed ones, in 3 queries."""
+    deltas = aggregate(added)
+    # Rows only need to be created for added reservations, the rows of removed reservations already exist (unless
+    # their room is being deleted).
+    new_keys = set(deltas)
+    deltas = {key: delta for key, delta in aggregate(removed, deltas, sign=-1).items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    OccupancyRollup.objects.bulk_create(
+        [OccupancyRollup(room_id=room, date=date, hour=hour) for room, date, hour in new_keys & set(deltas)],
+        ignore_conflicts=True,
+    )
+    rollups = []
+    for rollup in OccupancyRollup.objects.filter(
+        room_id__in={room for room, _, _ in deltas}, date__in={date for _, date, _ in deltas}
+    ).only("pk", "room_id", "date", "hour"):
+        delta = deltas.get((rollup.room_id, rollup.date, rollup.hour))
+        if delta is not None:
+            # Increment in the database, so concurrent updates of the same hour are never lost.
+            rollup.seat_minutes = F("seat_minutes") + delta[0]
+            rollup.blocked_minutes = F("blocked_minutes") + delta[1]
+            rollups.append(rollup)
+    OccupancyRollup.objects.bulk_update(rollups, ["seat_minutes", "blocked_minutes"])
+
+
+def slot_start(moment):
+    """Return the start of the slot that contains moment."""
+    return moment - (moment - EPOCH) % SLOT
+
+
+def slot_starts(start, end):
+    """Yield the start of all slots overlapping the range from start to end."""
+    slot = slot_start(start)
+    while slot < end:
+        yield slot
+        slot += SLOT
+
+
+def count_slots(reservations, totals=None, sign=1):
+    """Add the reservations and blocking reservations to the totals per (room, slot start) and return them."""
+    if totals is None:
+        totals = defaultdict(lambda: [0, 0])
+    for room, start, end, blocked in reservations:
+        for slot in slot_starts(start, end):
+            counts = totals[room, slot]
+            counts[0] += sign
+            if blocked:
+                counts[1] += sign
+    return totals
+
+
+def record_slots(added=(), removed=()):
+    """Add the added reservations to the slots and remove the removed ones, using three queries."""
+    deltas = count_slots(added)
+    new_keys = set(deltas)
+    deltas = {key: delta for key, delta in count_slots(removed, deltas, sign=-1).items() if delta != [0, 0]}
+    if not deltas:
+        return
+
+    OccupancySlot.objects.bulk_create(
+        [OccupancySlot(room_id=room, start=start) for room, start in new_keys & set(deltas)], ignore_conflicts=True
+    )
+    slots = []
+    for slot in OccupancySlot.objects.filter(
+        room_id__in={room for room, _ in deltas},
+        start__gte=min(start for _, start in deltas),
+        start__lte=max(start for _, start in deltas),
+    ).only("pk", "room_id", "start"):
+        delta = deltas.get((slot.room_id, slot.start))
+        if delta is not None:
+            # Increment in the database, so concurrent updates of the same slot are never lost.
+            slot.booked = F("booked") + delta[0]
+            slot.blocked = F("blocked") + delta[1]
+            slots.append(slot)
+    OccupancySlot.objects.bulk_update(slots, ["booked", "blocked"])
+
+
+def crowded_slots(room, start, end, capacity):
+    """
+    Return the slots of a room from start to end that are full or blocked.
+
+    As reservations count for every slot they overlap, a reservation from start to end cannot collide with the
+    reservations in the room if there are no such slots.
+    """
+    return OccupancySlot.objects.filter(room_id=room, start__gte=slot_start(start), start__lt=end).filter(
+        Q(booked__gte=capacity) | Q(blocked__gt=0)
+    )
@@ -0,0 +1,103 @@
+"""
+Booking policies of the rooms.
+
+A `RoomPolicy` is compiled into a `Policy`, which checks the times of a reservation and the number of simultaneous
+reservations of a user without querying the database. The compiled policies are kept in the room registry, so they
+are only compiled again when a room or policy changes. Rooms without a policy follow `DEFAULT_POLICY`, which has the
+defaults of `RoomPolicy`.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import RoomPolicy
+
+
+def format_time(value):
+    """Format a time like 8:00."""
+    return f"{value.hour}:{value.minute:02d}"
+
+
+def format_days(days):
+    """Format a number of days like 1 week or 3 days."""
+    if days % 7 == 0:
+        weeks = days // 7
+        return f"{weeks} week" if weeks == 1 else f"{weeks} weeks"
+    return f"{days} day" if days == 1 else f"{days} days"
+
+
+class Policy:
+    """The compiled rules of a room policy."""
+
+    def __init__(self, room_policy):
+        """Compile a RoomPolicy."""
+        self.opening_time = room_policy.opening_time
+        self.closing_time = room_policy.closing_time
+        # Reservations have to end before the closing time, so the last minute of a slot ends a minute earlier.
+        self.last_minute = (datetime.combine(datetime.min, room_policy.closing_time) - timedelta(minutes=1)).time()
+        self.weekdays = frozenset(range(7) if room_policy.open_in_weekends else range(5))
+        self.horizon = timedelta(days=room_policy.horizon)
+        self.max_duration = room_policy.max_duration
+        self.max_concurrent_reservations = room_policy.max_concurrent_reservations
+
+        self.horizon_message = f"You can only make reservation {format_days(room_policy.horizon)} in advance"
+        self.hours_message = (
+            f"Please enter times between {format_time(self.opening_time)} and {format_time(self.closing_time)}"
+        )
+        if self.max_concurrent_reservations <= 1:
+            self.concurrent_message = "You cannot reserve multiple rooms"
+        else:
+            self.concurrent_message = (
+                f"You cannot have more than {self.max_concurrent_reservations} reservations at the same time"
+            )
+
+    def check_times(self, start_time, end_time):
+        """Return why the times of a reservation are not allowed, or None if they are."""
+        start_time = start_time.astimezone(timezone.get_current_timezone())
+        end_time = end_time.astimezone(timezone.get_current_timezone())
+
+        if end_time.date() > timezone.now().date() + self.horizon:
+            return self.horizon_message
+
+        if end_time.date() - start_time.date() >= timedelta(days=1):
+            return "Reservation too long. Please shorten your reservation"
+
+        if start_time >= end_time:
+            return "Start time needs to be before end time"
+
+        if self.max_duration is not None and end_time - start_time > self.max_duration:
+            return "Reservation too long. Please shorten your reservation"
+
+        if not (
+            self.opening_time <= start_time.time() < self.closing_time
+            and self.opening_time <= end_time.time() < self.closing_time
+        ):
+            return self.hours_message
+
+        if start_time.weekday() not in self.weekdays:
+            return "Rooms cannot be reserved in the weekends"
+
+        return None
+
+    def check_concurrent(self, count):
+        """Return why a user with count other reservations at the same time cannot reserve, or None if they can."""
+        if count >= self.max_concurrent_reservations:
+            return self.concurrent_message
+        return None
+
+
+DEFAULT_POLICY = Policy(RoomPolicy())
+
+
+def compile_policies(rooms):
+    """Return the compiled policy of each room, by primary key, compiling every policy only once."""
+    compiled = {}
+    policies = {}
+    for room in rooms:
+        if room.policy_id is None:
+            policies[room.pk] = DEFAULT_POLICY
+        else:
+            if room.policy_id not in compiled:
+                compiled[room.policy_id] = Policy(room.policy)
+            policies[room.pk] = compiled[room.policy_id]
+    return policies
@@ -0,0 +1,61 @@
+"""
+In-process registry of the rooms.
+
+Rooms change only a few times a year, so each process loads all rooms with their policies once and keeps them, with
+the compiled policies, until the room version in the shared cache changes. The version is bumped whenever a room or
+policy is saved or deleted, so all processes see the change on their next request.
+"""
+from django.db import transaction
+
+from .events import bump_version, get_version
+from .models import Room
+from .policies import DEFAULT_POLICY, compile_policies
+
+VERSION_KEY = "room_reservation:rooms:version"
+
+_registry = (None, {}, {})
+
+
+def load():
+    """Return the registry of this process, reloading it if the room version changed."""
+    global _registry
+    version = get_version(VERSION_KEY)
+    if _registry[0] != version:
+        rooms = {room.pk: room for room in Room.objects.select_related("policy").order_by("name")}
+        _registry = (version, rooms, compile_policies(rooms.values()))
+    return _registry
+
+
+def get_rooms():
+    """
+    Return a dict mapping the primary keys of all rooms to the rooms, ordered by name.
+
+    The rooms are shared by all requests in this process, so they must not be modified.
+    """
+    return load()[1]
+
+
+def get_room(pk):
+    """Return the room with primary key pk, or None if it does not exist."""
+    try:
+        return get_rooms().get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_policy(pk):
+    """Return the compiled policy of the room with primary key pk, or the default policy if it does not exist."""
+    return load()[2].get(pk, DEFAULT_POLICY)
+
+
+def invalidate():
+    """
+    Invalidate the registry in all processes.
+
+    The version is bumped again after the transaction commits, so a process that reloaded the rooms before the change
+    was visible does not keep the old rooms.
+    """
+    global _registry
+    _registry = (None, {}, {})
+    bump_version(VERSION_KEY)
+    transaction.on_commit(lambda: bump_version(VERSION_KEY))
@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import occupancy, rooms
+from .events import bump_version
+from .models import Reservation, Room, RoomPolicy
+
+
+_bulk_delete = ContextVar("bulk_delete", default=False)
+
+
+@contextmanager
+def bulk_delete():
+    """
+    Delete reservations in bulk within this context.
+
+    Deleted reservations are not removed from the occupancy one by one, so the caller has to remove them with
+    `bulk_changed` if needed. The cached events are invalidated only once at the end instead of for every reservation.
+    """
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+        invalidate_events()
+
+
+@contextmanager
+def archiving():
+    """
+    Archive the reservations that are deleted within this context, which keep their occupancy in the rollup.
+
+    The caller has to remove them from the slots with `occupancy.record_slots`.
+    """
+    with bulk_delete():
+        yield
+
+
+def invalidate_events():
+    """
+    Invalidate the cached events.
+
+    The version is bumped immediately and again after the transaction commits, so events cached by a concurrent
+    request in between (which may not see the uncommitted changes) are never served.
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def bulk_changed(added=(), removed=()):
+    """
+    Process reservations that were changed by bulk operations, which do not send signals.
+
+    Both arguments contain the reservations as (room_id, start_time, end_time, block_whole_room) tuples. An updated
+    reservation is removed with its old values and added with its new values.
+    """
+    invalidate_events()
+    occupancy.record(added, removed)
+
+
+@receiver(pre_save, sender=Reservation)
+def reservation_saving(sender, instance, **kwargs):
+    """Load the old values of a reservation that was not loaded from the database, to update the occupancy."""
+    if instance.pk is not None and occupancy.loaded_state(instance) is None:
+        instance._loaded_values = (
+            Reservation.objects.filter(pk=instance.pk).values(*occupancy.STATE_FIELDS).first() or {}
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    """Update the occupancy and invalidate the cached events when a reservation is saved."""
+    old = None if created else occupancy.loaded_state(instance)
+    new = occupancy.state(instance)
+    if old != new:
+        occupancy.record([new], [old] if old is not None else [])
+    instance._loaded_values = dict(zip(occupancy.STATE_FIELDS, new))
+    invalidate_events()
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    """Update the occupancy and invalidate the cached events when a reservation is deleted."""
+    if _bulk_delete.get():
+        return
+    occupancy.record(removed=[occupancy.loaded_state(instance) or occupancy.state(instance)])
+    invalidate_events()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def room_changed(sender, **kwargs):
+    """Invalidate the room registry and the cached events when a room changes."""
+    rooms.invalidate()
+    invalidate_events()
+
+
+@receiver(post_save, sender=RoomPolicy)
+@receiver(post_delete, sender=RoomPolicy)
+def policy_changed(sender, **kwargs):
+    """Invalidate the room registry, which contains the compiled policies, when a policy changes."""
+    rooms.invalidate()
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, update_fields=None, **kwargs):
+    """Invalidate the cached events when the name of a user might have changed."""
+    if update_fields is None or {"first_name", "last_name"} & set(update_fields):
+        invalidate_events()
@@ -1,5 +1,6 @@
 const csrfToken = document.getElementById('calendar').getAttribute('data-csrf');
 const notifications = document.getElementById('notifications');
+const roomNames = JSON.parse(document.getElementById('room-names').textContent);
 let mouseHovering = false;
 
 notifications.addEventListener('mouseenter', () => mouseHovering = true);
@@ -45,18 +46,44 @@ function addNotification(textContent, undoCallback) {
   }, 10000);
 }
 
-async function addEvent(event) {
+function currentRecurrence() {
+  const frequency = document.getElementById('recurrence-frequency');
+  const until = document.getElementById('recurrence-until');
+  if (frequency === null || frequency.value === '' || until.value === '') {
+    return null;
+  }
+  return {frequency: frequency.value, until: until.value};
+}
+
+// Send a POST request, retrying when the connection fails. All attempts have the same Idempotency-Key, so the
+// server makes the change at most once and returns the same response to the retries.
+async function post(url, body = null) {
+  const key = window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await fetch(new Request(url, {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'X-CSRFToken': csrfToken, 'Idempotency-Key': key },
+        body: body,
+      }));
+    } catch (error) {
+      if (attempt === 3) {
+        throw error;
+      }
+      await new Promise(resolve => window.setTimeout(resolve, 500 * attempt));
+    }
+  }
+}
+
+async function addEvent(event, recurrence = null) {
   const body = JSON.stringify({
     room: event.extendedProps.room,
     start_time: event.start,
-    end_time: event.end
+    end_time: event.end,
+    recurrence: recurrence,
   });
-  const resp = await fetch(new Request('/reservations/create', {
-    method: 'POST',
-    credentials: 'include',
-    headers: { 'X-CSRFToken': csrfToken },
-    body: body,
-  }));
+  const resp = await post('/reservations/create', body);
   if (resp.status !== 200) {
     alert("An unknown error occurred.");
     event.remove();
@@ -77,12 +104,7 @@ async function changeEvent(info) {
     start_time: start_time,
     end_time: end_time,
   });
-  const resp = await fetch(new Request(`/reservations/${pk}/update`, {
-    method: 'POST',
-    credentials: 'include',
-    headers: { 'X-CSRFToken': csrfToken },
-    body: body,
-  }));
+  const resp = await post(`/reservations/${pk}/update`, body);
 
   if (resp.status !== 200) {
     info.revert();
@@ -97,6 +119,82 @@ async function changeEvent(info) {
   }
 }
 
+function decodeEvents(payload) {
+  return payload.events.map(([pk, reservee, room, start, duration, blocked, editable, series]) => {
+    const name = payload.users[reservee];
+    const roomName = roomNames[room] || '';
+    return {
+      pk: pk,
+      title: blocked ? `${roomName} BLOCKED` : `${name} (${roomName})`,
+      reservee: name,
+      room: room,
+      start: new Date(start * 60000),
+      end: new Date((start + duration) * 60000),
+      series: series,
+      editable: editable,
+    };
+  });
+}
+
+async function fetchEvents(info, successCallback, failureCallback) {
+  const params = new URLSearchParams({start: info.startStr, end: info.endStr, format: 'compact'});
+  const resp = await fetch(`/reservations/events?${params}`, {credentials: 'include'});
+  if (resp.status !== 200) {
+    failureCallback(new Error("An unknown error occurred."));
+    return;
+  }
+  successCallback(decodeEvents(await resp.json()));
+}
+
+function findEvent(calendar, pk) {
+  return calendar.getEvents().find(event => event.extendedProps.pk === pk);
+}
+
+// Add an event to the event source, so it is replaced instead of duplicated when the events are fetched again.
+function addSourceEvent(calendar, event) {
+  const existing = findEvent(calendar, event.pk);
+  if (existing) {
+    existing.remove();
+  }
+  calendar.addEvent(event, calendar.getEventSources()[0]);
+}
+
+// Fetch the events again, removing events that are not part of the event source (like dropped events) first.
+function refetchEvents(calendar) {
+  calendar.getEvents().filter(event => event.source === null).forEach(event => event.remove());
+  calendar.refetchEvents();
+}
+
+function applyChange(calendar, change) {
+  if (change.action === 'delete') {
+    const existing = findEvent(calendar, change.pk);
+    if (existing) {
+      existing.remove();
+    }
+  } else {
+    addSourceEvent(calendar, change.event);
+  }
+}
+
+let changeStream = null;
+
+function streamChanges(calendar, start, end) {
+  if (changeStream !== null) {
+    changeStream.close();
+  }
+  const params = new URLSearchParams({start: start.toISOString(), end: end.toISOString()});
+  changeStream = new EventSource(`/reservations/stream?${params}`);
+  let connected = false;
+  changeStream.addEventListener('open', () => {
+    // Changes made while reconnecting are missed, so the events are fetched again (which is cheap if nothing changed).
+    if (connected) {
+      refetchEvents(calendar);
+    }
+    connected = true;
+  });
+  changeStream.addEventListener('change', message => applyChange(calendar, JSON.parse(message.data)));
+}
+
 document.addEventListener('DOMContentLoaded', function() {
   const calendarEl = document.getElementById('calendar');
   const Draggable = FullCalendarInteraction.Draggable;
@@ -143,25 +241,43 @@ document.addEventListener('DOMContentLoaded', function() {
     droppable: true,
     displayEventEnd: true,
     eventReceive: async function({event}) {
-      const message = await addEvent(event);
+      const message = await addEvent(event, currentRecurrence());
       if (!message.ok) {
         alert(message.message);
         event.remove();
         return;
       }
-      event.setProp('title', event.title + ' (you)');
-      event.setExtendedProp('pk', message.pk);
+      event.remove();
+      if (message.series) {
+        refetchEvents(calendar);
+        return;
+      }
+      // The dropped event is replaced by one in the event source, which also replaces one the change stream added.
+      addSourceEvent(calendar, {
+        pk: message.pk,
+        title: event.title + ' (you)',
+        room: event.extendedProps.room,
+        start: event.start,
+        end: event.end,
+        editable: true,
+      });
     },
     eventClick: async function({event}) {
       if (!event.durationEditable) {
         return;
       }
+      const series = event.extendedProps.series;
+      if (series && confirm('Delete all upcoming reservations of this series?')) {
+        const resp = await post(`/reservations/series/${series}/delete`);
+        const message = resp.status === 200 ? JSON.parse(await resp.text()) : {ok: false, message: "An unknown error occurred."};
+        if (!message.ok) {
+          alert(message.message);
+        }
+        refetchEvents(calendar);
+        return;
+      }
       const pk = event.extendedProps.pk;
-      const resp = await fetch(new Request(`/reservations/${pk}/delete`, {
-          method: 'POST',
-          credentials: 'include',
-          headers: { 'X-CSRFToken': csrfToken },
-      }));
+      const resp = await post(`/reservations/${pk}/delete`);
       if (resp.status !== 200) {
         alert("An unknown error occurred.");
         return;
@@ -185,7 +301,7 @@ document.addEventListener('DOMContentLoaded', function() {
           event.remove();
           return;
         }
-        calendar.addEvent({
+        addSourceEvent(calendar, {
           pk: message.pk,
           title: event.title,
           reservee: event.extendedProps.reservee,
@@ -198,7 +314,10 @@ document.addEventListener('DOMContentLoaded', function() {
     },
     eventDrop: changeEvent,
     eventResize: changeEvent,
-    events: JSON.parse(document.getElementById('calendar').getAttribute('data-events'))
+    datesRender: function({view}) {
+      streamChanges(calendar, view.activeStart, view.activeEnd);
+    },
+    events: fetchEvents,
   });
 
   calendar.render();
@@ -0,0 +1,99 @@
+from datetime import datetime, time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation.admin import ReservationAdmin
+from room_reservation.models import OccupancyRollup, Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class ReservationAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "admin")
+        cls.room = Room.objects.create(name="New York", capacity=5)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def at(self, hour):
+        return timezone.make_aware(datetime.combine(self.day, time(hour)))
+
+    def create_reservations(self, count):
+        offset = get_user_model().objects.count()
+        users = [get_user_model().objects.create_user(f"user{offset + i}") for i in range(count)]
+        return [
+            Reservation.objects.create(reservee=user, room=self.room, start_time=self.at(10), end_time=self.at(11))
+            for user in users
+        ]
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:room_reservation_reservation_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        self.create_reservations(2)
+        # The first request also loads the default IdP of the process.
+        self.changelist_queries()
+        queries = self.changelist_queries()
+        self.create_reservations(10)
+        self.assertEqual(self.changelist_queries(), queries)
+
+    def test_delete_action(self):
+        reservations = self.create_reservations(3)
+        data = {
+            "action": "delete_reservations",
+            "_selected_action": [reservation.pk for reservation in reservations[:2]],
+        }
+        response = self.client.post(reverse("admin:room_reservation_reservation_changelist"), data)
+        self.assertContains(response, "Are you sure you want to delete the 2 selected reservations?")
+        self.assertEqual(Reservation.objects.count(), 3)
+
+        response = self.client.post(reverse("admin:room_reservation_reservation_changelist"), {**data, "post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Reservation.objects.values_list("pk", flat=True)), [reservations[2].pk])
+        self.assertEqual(OccupancyRollup.objects.get(room=self.room, hour=10).seat_minutes, 60)
+
+    @mock.patch.object(ReservationAdmin, "delete_chunk_size", 2)
+    def test_delete_action_across_pages(self):
+        reservations = self.create_reservations(5)
+        other_room = Room.objects.create(name="Paris", capacity=5)
+        Reservation.objects.create(reservee=self.admin, room=other_room, start_time=self.at(10), end_time=self.at(11))
+        response = self.client.post(
+            f"{reverse('admin:room_reservation_reservation_changelist')}?room__id__exact={self.room.pk}",
+            # Selecting all reservations also selects those on the page.
+            {
+                "action": "delete_reservations",
+                "select_across": "1",
+                "_selected_action": [reservations[0].pk],
+                "post": "yes",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Reservation.objects.values_list("room", flat=True)), [other_room.pk])
+        self.assertEqual(OccupancyRollup.objects.get(room=self.room, hour=10).seat_minutes, 0)
+
+    def test_block_action(self):
+        reservations = self.create_reservations(2)
+        self.client.post(
+            reverse("admin:room_reservation_reservation_changelist"),
+            {"action": "block_rooms", "_selected_action": [reservations[0].pk]},
+        )
+        self.assertEqual(list(Reservation.objects.filter(block_whole_room=True)), [reservations[0]])
+        rollup = OccupancyRollup.objects.get(room=self.room, hour=10)
+        self.assertEqual((rollup.seat_minutes, rollup.blocked_minutes), (60, 60))
+
+    def test_default_delete_action_removed(self):
+        response = self.client.get(reverse("admin:room_reservation_reservation_changelist"))
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="delete_reservations"')
@@ -1,35 +1,52 @@
 import json
+from datetime import datetime, time, timedelta
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.utils import timezone
 
+from room_reservation import rooms
 from room_reservation.models import Reservation, Room
+from room_reservation.views import BaseReservationView
+
+
+def next_weekday():
+    """Return the first weekday after today, which is always within the 1 week reservation horizon."""
+    day = timezone.localdate() + timedelta(days=1)
+    while day.weekday() in (5, 6):
+        day += timedelta(days=1)
+    return day
 
 
 class ReservationTest(TestCase):
     @classmethod
     def setUpTestData(cls):
+        cls.day = next_weekday()
+
         cls.user = get_user_model().objects.create_user("test1")
         cls.other_user = get_user_model().objects.create_user("test2")
 
-        cls.room = Room.objects.create(name="New York", location="Merc 0.1337")
+        cls.room = Room.objects.create(name="New York", capacity=1)
 
         cls.user_reservation = Reservation.objects.create(
             reservee=cls.user,
             room=cls.room,
-            start_time=timezone.now(),
-            end_time=timezone.now() + timezone.timedelta(hours=1),
+            start_time=cls.at(10),
+            end_time=cls.at(11),
         )
 
         cls.other_reservation = Reservation.objects.create(
             reservee=cls.other_user,
             room=cls.room,
-            start_time=timezone.now(),
-            end_time=timezone.now() + timezone.timedelta(hours=1),
+            start_time=cls.at(10),
+            end_time=cls.at(11),
         )
 
+    @classmethod
+    def at(cls, hour, days=0):
+        return timezone.make_aware(datetime.combine(cls.day + timedelta(days=days), time(hour)))
+
     def setUp(self):
         self.client = Client()
         self.client.force_login(self.user)
@@ -43,8 +60,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -55,8 +72,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 5, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16, days=1),
             },
             content_type="application/json",
         )
@@ -67,8 +84,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(14),
             },
             content_type="application/json",
         )
@@ -79,8 +96,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 6, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 7, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(6),
+                "end_time": self.at(7),
             },
             content_type="application/json",
         )
@@ -103,8 +120,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -112,12 +129,12 @@ class ReservationTest(TestCase):
             reverse("room_reservation:create_reservation"),
             {
                 "room": self.room.pk,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
-        self.assertContains(response, "Room already reserved in this timeslot")
+        self.assertContains(response, "You cannot reserve multiple rooms")
 
     def test_bad_request(self):
         response = self.client.post(reverse("room_reservation:create_reservation"), {"test": "hai"})
@@ -131,13 +148,59 @@ class ReservationTest(TestCase):
             ),
             {
                 "room": self.user_reservation.room_id,
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
         self.assertContains(response, '"ok": true')
 
+    def test_update_reservation_other_room(self):
+        # The room of the reservation is full, but the update must not be checked against an empty room instead.
+        other_room = Room.objects.create(name="Tokyo", capacity=5)
+        response = self.client.post(
+            reverse(
+                "room_reservation:update_reservation",
+                kwargs={"pk": self.user_reservation.pk},
+            ),
+            {
+                "room": other_room.pk,
+                "start_time": self.at(10),
+                "end_time": self.at(12),
+            },
+            content_type="application/json",
+        )
+        self.assertContains(response, "You cannot move a reservation to another room")
+
+    def test_update_reservation_room_as_string(self):
+        response = self.client.post(
+            reverse(
+                "room_reservation:update_reservation",
+                kwargs={"pk": self.user_reservation.pk},
+            ),
+            {
+                "room": str(self.user_reservation.room_id),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"ok": True})
+
+        response = self.client.post(
+            reverse(
+                "room_reservation:update_reservation",
+                kwargs={"pk": self.user_reservation.pk},
+            ),
+            {
+                "room": "New York",
+                "start_time": self.at(14),
+                "end_time": self.at(16),
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_update_reservation_malformed(self):
         response = self.client.post(
             reverse(
@@ -145,8 +208,8 @@ class ReservationTest(TestCase):
                 kwargs={"pk": self.user_reservation.pk},
             ),
             {
-                "start_time": timezone.datetime(2019, 3, 4, 14, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(14),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -160,8 +223,8 @@ class ReservationTest(TestCase):
             ),
             {
                 "room": self.user_reservation.room_id,
-                "start_time": timezone.datetime(2019, 3, 4, 5, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(5),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -172,8 +235,8 @@ class ReservationTest(TestCase):
             reverse("room_reservation:update_reservation", kwargs={"pk": 100}),
             {
                 "room": self.user_reservation.room_id,
-                "start_time": timezone.datetime(2019, 3, 4, 8, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(8),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -187,8 +250,8 @@ class ReservationTest(TestCase):
             ),
             {
                 "room": self.user_reservation.room_id,
-                "start_time": timezone.datetime(2019, 3, 4, 8, 0, 0, tzinfo=timezone.get_current_timezone()),
-                "end_time": timezone.datetime(2019, 3, 4, 16, 0, 0, tzinfo=timezone.get_current_timezone()),
+                "start_time": self.at(8),
+                "end_time": self.at(16),
             },
             content_type="application/json",
         )
@@ -215,3 +278,61 @@ class ReservationTest(TestCase):
             )
         )
         self.assertContains(response, "You can only delete your own events")
+
+    def test_capacity_reached(self):
+        self.client.force_login(get_user_model().objects.create_user("test3"))
+        response = self.client.post(
+            reverse("room_reservation:create_reservation"),
+            {
+                "room": self.room.pk,
+                "start_time": self.at(10),
+                "end_time": self.at(12),
+            },
+            content_type="application/json",
+        )
+        self.assertContains(response, "Capacity is reached for this room")
+
+    def test_room_blocked(self):
+        room = Room.objects.create(name="Tokyo", capacity=10)
+        Reservation.objects.create(
+            reservee=self.other_user, room=room, start_time=self.at(13), end_time=self.at(17), block_whole_room=True
+        )
+        response = self.client.post(
+            reverse("room_reservation:create_reservation"),
+            {
+                "room": room.pk,
+                "start_time": self.at(14),
+                "end_time": self.at(15),
+            },
+            content_type="application/json",
+        )
+        self.assertContains(response, "This room is blocked.")
+
+    def test_room_registry(self):
+        room = Room.objects.create(name="Tokyo", capacity=2)
+        self.assertEqual(rooms.get_room(room.pk).capacity, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(rooms.get_room(str(room.pk)).name, "Tokyo")
+            self.assertIsNone(rooms.get_room("Tokyo"))
+
+        room.capacity = 3
+        room.save()
+        self.assertEqual(rooms.get_room(room.pk).capacity, 3)
+        room.delete()
+        self.assertIsNone(rooms.get_room(room.pk))
+
+    def test_validate_query_count(self):
+        room = Room.objects.create(name="Tokyo", capacity=2)
+        for hour in (12, 13, 14):
+            Reservation.objects.create(
+                reservee=self.other_user, room=room, start_time=self.at(hour), end_time=self.at(hour + 2)
+            )
+        view = BaseReservationView()
+        # The first validation loads the room registry.
+        with self.assertNumQueries(2):
+            self.assertEqual(view.validate(room.pk, self.at(12), self.at(13), user=self.user), (True, None))
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                view.validate(room.pk, self.at(13), self.at(14), user=self.user),
+                (False, "Capacity is reached for this room"),
+            )
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from room_reservation.models import ArchivedReservation, OccupancyRollup, Reservation, ReservationSeries, Room
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.room = Room.objects.create(name="New York", capacity=2)
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for days in (400, 380, 10):
+            Reservation.objects.create(
+                reservee=cls.user,
+                room=cls.room,
+                start_time=now - timedelta(days=days, hours=2),
+                end_time=now - timedelta(days=days),
+            )
+
+    def rollup(self):
+        return set(OccupancyRollup.objects.exclude(seat_minutes=0).values_list("date", "hour", "seat_minutes"))
+
+    def test_archive(self):
+        old = set(Reservation.objects.filter(end_time__lt=timezone.now() - timedelta(days=365)).values_list("pk"))
+        rollup = self.rollup()
+        call_command("archive_reservations", days=365, chunk_size=1, stdout=StringIO())
+        self.assertEqual(set(ArchivedReservation.objects.values_list("pk")), old)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(self.rollup(), rollup)
+        # The archived reservations are removed from the slots.
+        call_command("rebuild_slots", verify=True, stdout=StringIO())
+
+    def test_archive_keeps_series(self):
+        series = ReservationSeries.objects.create(
+            reservee=self.user, frequency=ReservationSeries.WEEKLY, until=timezone.now().date()
+        )
+        Reservation.objects.update(series=series)
+        call_command("archive_reservations", days=365, stdout=StringIO())
+        self.assertEqual(set(ArchivedReservation.objects.values_list("series", flat=True)), {series.pk})
+
+    def test_archive_conflict(self):
+        reservation = Reservation.objects.order_by("start_time").first()
+        ArchivedReservation.objects.create(
+            pk=reservation.pk,
+            reservee=self.user,
+            room=self.room,
+            start_time=reservation.start_time,
+            end_time=reservation.end_time,
+        )
+        with self.assertRaises(IntegrityError):
+            call_command("archive_reservations", days=365, stdout=StringIO())
+        # The reservations are not deleted if they could not be archived.
+        self.assertEqual(Reservation.objects.count(), 3)
+
+    def test_rebuild_includes_archive(self):
+        call_command("archive_reservations", days=365, stdout=StringIO())
+        rollup = self.rollup()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(self.rollup(), rollup)
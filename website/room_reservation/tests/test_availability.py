@@ -0,0 +1,104 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation import availability, rooms
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class AvailabilityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        user = get_user_model().objects.create_user("test1")
+
+        cls.small_room = Room.objects.create(name="A", capacity=1)
+        cls.large_room = Room.objects.create(name="B", capacity=2)
+        cls.blocked_room = Room.objects.create(name="C", capacity=5)
+
+        for room, start, end, blocked in (
+            (cls.small_room, 10, 12, False),
+            (cls.large_room, 9, 11, False),
+            (cls.large_room, 10, 13, False),
+            (cls.blocked_room, 13, 15, True),
+        ):
+            Reservation.objects.create(
+                reservee=user, room=room, start_time=cls.at(start), end_time=cls.at(end), block_whole_room=blocked
+            )
+
+    @classmethod
+    def at(cls, hour, minute=0):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour, minute)))
+
+    def get_slots(self, duration):
+        rooms.get_rooms()
+        with self.assertNumQueries(1):
+            response = Client().get(
+                reverse("room_reservation:availability"),
+                {"from": self.day.isoformat(), "to": (self.day + timedelta(days=1)).isoformat(), "duration": duration},
+            )
+        return {
+            room["name"]: [(slot["start"], slot["end"]) for slot in room["slots"]] for room in response.json()["rooms"]
+        }
+
+    def slot(self, start, end):
+        return (start.isoformat(), end.isoformat())
+
+    def test_free_slots(self):
+        self.assertEqual(
+            self.get_slots(60),
+            {
+                "A": [self.slot(self.at(8), self.at(10)), self.slot(self.at(12), self.at(17, 59))],
+                "B": [self.slot(self.at(8), self.at(10)), self.slot(self.at(11), self.at(17, 59))],
+                "C": [self.slot(self.at(8), self.at(13)), self.slot(self.at(15), self.at(17, 59))],
+            },
+        )
+
+    def test_duration(self):
+        self.assertEqual(
+            self.get_slots(150),
+            {
+                "A": [self.slot(self.at(12), self.at(17, 59))],
+                "B": [self.slot(self.at(11), self.at(17, 59))],
+                "C": [self.slot(self.at(8), self.at(13)), self.slot(self.at(15), self.at(17, 59))],
+            },
+        )
+
+    def test_bad_request(self):
+        response = Client().get(reverse("room_reservation:availability"), {"from": "today", "to": "tomorrow"})
+        self.assertEqual(response.status_code, 400)
+        response = Client().get(
+            reverse("room_reservation:availability"),
+            {"from": self.day.isoformat(), "to": self.day.isoformat(), "duration": 0},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SweepTest(TestCase):
+    def setUp(self):
+        self.start = timezone.make_aware(datetime(2021, 3, 1))
+
+    def at(self, hour):
+        return self.start + timedelta(hours=hour)
+
+    def test_busy_intervals(self):
+        reservations = [
+            (self.at(9), self.at(11), False),
+            (self.at(10), self.at(12), False),
+            (self.at(12), self.at(14), False),
+            (self.at(13), self.at(15), False),
+            (self.at(16), self.at(17), True),
+        ]
+        self.assertEqual(
+            availability.busy_intervals(reservations, 2),
+            [(self.at(10), self.at(11)), (self.at(13), self.at(14)), (self.at(16), self.at(17))],
+        )
+
+    def test_opening_hours_skip_weekends(self):
+        intervals = availability.opening_hours(self.start, self.start + timedelta(weeks=1))
+        self.assertEqual(len(intervals), 5)
+        self.assertEqual(intervals[0], (self.at(8), self.start + timedelta(hours=17, minutes=59)))
@@ -0,0 +1,131 @@
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+from room_reservation.views import BaseReservationView
+
+
+class BatchReservationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.other_user = get_user_model().objects.create_user("test2")
+
+        cls.room = Room.objects.create(name="New York", capacity=1)
+
+        cls.user_reservation = Reservation.objects.create(
+            reservee=cls.user, room=cls.room, start_time=cls.at(10), end_time=cls.at(11)
+        )
+        cls.other_reservation = Reservation.objects.create(
+            reservee=cls.other_user, room=cls.room, start_time=cls.at(12), end_time=cls.at(13)
+        )
+
+    @classmethod
+    def at(cls, hour):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour)))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def batch(self, *operations):
+        return self.client.post(
+            reverse("room_reservation:batch_reservation"), {"operations": operations}, content_type="application/json"
+        )
+
+    def test_batch(self):
+        response = self.batch(
+            {"action": "create", "room": self.room.pk, "start_time": self.at(14), "end_time": self.at(15)},
+            {"action": "update", "pk": self.user_reservation.pk, "start_time": self.at(9), "end_time": self.at(10)},
+            {"action": "create", "room": self.room.pk, "start_time": self.at(16), "end_time": self.at(17)},
+        )
+        results = response.json()["results"]
+        self.assertTrue(all(result["ok"] for result in results))
+        self.assertEqual(
+            list(Reservation.objects.filter(reservee=self.user).order_by("start_time").values_list("pk", flat=True)),
+            [self.user_reservation.pk, results[0]["pk"], results[2]["pk"]],
+        )
+        self.user_reservation.refresh_from_db()
+        self.assertEqual(self.user_reservation.start_time, self.at(9))
+
+    def test_operations_see_earlier_operations(self):
+        response = self.batch(
+            {"action": "delete", "pk": self.user_reservation.pk},
+            {"action": "create", "room": self.room.pk, "start_time": self.at(10), "end_time": self.at(11)},
+            {"action": "create", "room": self.room.pk, "start_time": self.at(10), "end_time": self.at(11)},
+        )
+        results = response.json()["results"]
+        self.assertEqual(
+            results,
+            [
+                {"ok": True},
+                {"ok": True, "pk": results[1]["pk"]},
+                {"ok": False, "message": "You cannot reserve multiple rooms"},
+            ],
+        )
+        self.assertFalse(Reservation.objects.filter(pk=self.user_reservation.pk).exists())
+        self.assertEqual(Reservation.objects.filter(reservee=self.user).count(), 1)
+
+    def test_invalid_operations_are_not_applied(self):
+        response = self.batch(
+            {"action": "create", "room": self.room.pk, "start_time": self.at(12), "end_time": self.at(13)},
+            {"action": "update", "pk": self.other_reservation.pk, "start_time": self.at(9), "end_time": self.at(10)},
+            {"action": "delete", "pk": 100},
+            {"action": "create", "room": self.room.pk, "start_time": self.at(6), "end_time": self.at(7)},
+        )
+        self.assertEqual(
+            [result["message"] for result in response.json()["results"]],
+            [
+                "Capacity is reached for this room",
+                "You can only update your own events",
+                "This reservation does not exist",
+                "Please enter times between 8:00 and 18:00",
+            ],
+        )
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_bad_request(self):
+        response = self.batch({"action": "move", "pk": self.user_reservation.pk})
+        self.assertEqual(response.status_code, 400)
+        response = self.batch({"action": "create", "room": self.room.pk})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("room_reservation:batch_reservation"), {"test": "hai"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_too_many_operations(self):
+        response = self.batch(*[{"action": "delete", "pk": self.user_reservation.pk}] * 101)
+        self.assertEqual(response.status_code, 400)
+
+    def test_targets_read_after_locking(self):
+        # The reservation moves to another room after its room is looked up, but before it is locked.
+        other_room = Room.objects.create(name="Tokyo", capacity=1)
+        lock = BaseReservationView.lock
+        locked = []
+
+        def move_then_lock(view, user, *rooms):
+            if not locked:
+                Reservation.objects.filter(pk=self.user_reservation.pk).update(room=other_room)
+            locked.extend(rooms)
+            return lock(view, user, *rooms)
+
+        with mock.patch.object(BaseReservationView, "lock", move_then_lock):
+            response = self.batch(
+                {
+                    "action": "update",
+                    "pk": self.user_reservation.pk,
+                    "start_time": self.at(12),
+                    "end_time": self.at(13),
+                }
+            )
+        # The update is validated in the room it is in now, which is locked as well.
+        self.assertTrue(response.json()["results"][0]["ok"])
+        self.assertIn(other_room.pk, locked)
+        self.assertEqual(Reservation.objects.get(pk=self.user_reservation.pk).room, other_room)
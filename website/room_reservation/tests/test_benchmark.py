@@ -0,0 +1,14 @@
+from django.test import TransactionTestCase
+
+from room_reservation import benchmark
+from room_reservation.models import Reservation
+
+
+# Writes are benchmarked outside a test transaction, as in production.
+class QueryBudgetTest(TransactionTestCase):
+    def test_query_budgets(self):
+        benchmark.seed(users=10, rooms_count=5, reservations=500, days=60)
+        self.assertEqual(Reservation.objects.count(), 500)
+        results = benchmark.Benchmark(count=5).run()
+        self.assertEqual([result["name"] for result in results], list(benchmark.BUDGETS))
+        self.assertEqual(benchmark.regressions(results, latency=False), [])
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+from room_reservation.views import BaseReservationView
+
+
+# Sessions are kept out of the database, so only the reservation endpoint itself contends for it.
+@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+class ConcurrentReservationTest(TransactionTestCase):
+    users = 20
+    capacity = 5
+
+    def setUp(self):
+        self.day = next_weekday()
+        self.room = Room.objects.create(name="New York", capacity=self.capacity)
+        self.clients = []
+        for i in range(self.users):
+            client = Client()
+            client.force_login(get_user_model().objects.create_user(f"test{i}"))
+            self.clients.append(client)
+
+    def create(self, client):
+        try:
+            return client.post(
+                reverse("room_reservation:create_reservation"),
+                {
+                    "room": self.room.pk,
+                    "start_time": f"{self.day.isoformat()}T10:00:00+01:00",
+                    "end_time": f"{self.day.isoformat()}T12:00:00+01:00",
+                },
+                content_type="application/json",
+            ).json()
+        finally:
+            connection.close()
+
+    # The in-memory test database of SQLite fails on lock conflicts immediately instead of waiting like Postgres and
+    # file databases do, so conflicting transactions need more attempts.
+    @mock.patch.object(BaseReservationView, "write_attempts", 20)
+    def test_parallel_creates_respect_capacity(self):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.create, self.clients))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(sum(result["ok"] for result in results), self.capacity)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), self.capacity)
+        self.assertEqual(
+            {result["message"] for result in results if not result["ok"]}, {"Capacity is reached for this room"}
+        )
+        self.assertLess(elapsed, 10)
@@ -0,0 +1,137 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import dateparse
+
+from room_reservation import events
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class ReservationEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+
+        cls.user = get_user_model().objects.create_user("test1", first_name="Test", last_name="User")
+        cls.other_user = get_user_model().objects.create_user("test2", first_name="Other", last_name="User")
+
+        cls.room = Room.objects.create(name="New York", capacity=5)
+
+        for user in (cls.user, cls.other_user):
+            Reservation.objects.create(
+                reservee=user,
+                room=cls.room,
+                start_time=f"{cls.day.isoformat()}T10:00:00+01:00",
+                end_time=f"{cls.day.isoformat()}T11:00:00+01:00",
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_events(self, start, end):
+        return self.client.get(reverse("room_reservation:events"), {"start": start, "end": end})
+
+    def read(self, response):
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_events_in_range(self):
+        response = self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T23:59:59+01:00")
+        self.assertEqual(response.status_code, 200)
+        events = self.read(response)
+        self.assertEqual(len(events), 2)
+        self.assertEqual(
+            [(event["reservee"], event["editable"]) for event in events],
+            [("Test User", True), ("Other User", False)],
+        )
+        self.assertEqual(events[0]["title"], "Test User (New York)")
+
+    def test_events_outside_range(self):
+        response = self.get_events("2019-03-04", "2019-03-11")
+        self.assertEqual(self.read(response), [])
+
+    def test_range_is_capped(self):
+        response = self.get_events("2019-03-04", "2099-01-01")
+        self.assertEqual(self.read(response), [])
+
+    def test_streamed_in_parts(self):
+        response = self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T23:59:59+01:00")
+        self.assertTrue(response.streaming)
+        parts = list(events.json_array(({"pk": pk} for pk in range(5)), chunk_size=2))
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(json.loads("".join(parts)), [{"pk": pk} for pk in range(5)])
+        self.assertEqual("".join(events.json_array([])), "[]")
+
+    def test_compact_format(self):
+        params = {"start": self.day.isoformat(), "end": f"{self.day.isoformat()}T23:59:59+01:00"}
+        verbose = self.read(self.client.get(reverse("room_reservation:events"), params))
+        response = self.client.get(reverse("room_reservation:events"), {**params, "format": "compact"})
+        self.assertEqual(response["Content-Type"], events.COMPACT_MEDIA_TYPE)
+        compact = self.read(response)
+        self.assertEqual(compact["users"], {str(self.user.pk): "Test User", str(self.other_user.pk): "Other User"})
+
+        pk, reservee, room, start, duration, blocked, editable, series = compact["events"][0]
+        self.assertEqual((pk, reservee, room), (verbose[0]["pk"], self.user.pk, self.room.pk))
+        self.assertEqual(start * 60, dateparse.parse_datetime(verbose[0]["start"]).timestamp())
+        self.assertEqual((duration, blocked, editable, series), (60, False, True, None))
+
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse("room_reservation:events"),
+            params,
+            HTTP_ACCEPT=events.COMPACT_MEDIA_TYPE,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse("room_reservation:events"), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_range(self):
+        response = self.get_events("yesterday", "today")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("room_reservation:events"))
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count(self):
+        self.client.logout()
+        with self.assertNumQueries(1):
+            self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T23:59:59+01:00")
+        with self.assertNumQueries(0):
+            self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T12:00:00+01:00")
+
+    def test_not_modified(self):
+        self.client.logout()
+        response = self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T23:59:59+01:00")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse("room_reservation:events"),
+                {"start": self.day.isoformat(), "end": f"{self.day.isoformat()}T23:59:59+01:00"},
+                HTTP_IF_NONE_MATCH=etag,
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_on_change(self):
+        response = self.get_events(self.day.isoformat(), f"{self.day.isoformat()}T23:59:59+01:00")
+        etag = response["ETag"]
+        Reservation.objects.filter(reservee=self.other_user).delete()
+        response = self.client.get(
+            reverse("room_reservation:events"),
+            {"start": self.day.isoformat(), "end": f"{self.day.isoformat()}T23:59:59+01:00"},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.read(response)), 1)
+
+    def test_room_filter(self):
+        room = Room.objects.create(name="Tokyo", capacity=5)
+        response = self.client.get(
+            reverse("room_reservation:events"),
+            {"start": self.day.isoformat(), "end": f"{self.day.isoformat()}T23:59:59+01:00", "room": room.pk},
+        )
+        self.assertEqual(self.read(response), [])
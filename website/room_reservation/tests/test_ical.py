@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from room_reservation import ical
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class ICalendarTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1", first_name="Test", last_name="User")
+        cls.other_user = get_user_model().objects.create_user("test2", first_name="Other", last_name="User")
+        cls.room = Room.objects.create(name="New York", capacity=5)
+        cls.other_room = Room.objects.create(name="Paris", capacity=5)
+
+        for user, room in ((cls.user, cls.room), (cls.other_user, cls.room), (cls.other_user, cls.other_room)):
+            Reservation.objects.create(
+                reservee=user,
+                room=room,
+                start_time=f"{cls.day.isoformat()}T10:00:00+01:00",
+                end_time=f"{cls.day.isoformat()}T11:00:00+01:00",
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed_url(self, feed, pk):
+        key = ical.get_or_create_key(self.user.pk)
+        return reverse("room_reservation:ical", kwargs={"token": ical.token(feed, pk, self.user.pk, key)})
+
+    def get_feed(self, feed, pk, **headers):
+        return self.client.get(self.feed_url(feed, pk), **headers)
+
+    def test_invalid_token(self):
+        response = self.client.get(reverse("room_reservation:ical", kwargs={"token": f"user-{self.user.pk}:forged"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_replaced_key(self):
+        url = self.feed_url("room", self.room.pk)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(reverse("room_reservation:replace_feed_key")).status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(self.feed_url("room", self.room.pk)).status_code, 200)
+
+    def test_calendar_links(self):
+        self.client.force_login(self.user)
+        content = self.client.get(reverse("room_reservation:calendar")).content.decode()
+        self.assertIn(self.feed_url("user", self.user.pk), content)
+        self.assertIn(self.feed_url("room", self.other_room.pk), content)
+
+    def test_user_feed(self):
+        response = self.get_feed("user", self.user.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        content = response.content.decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertIn("X-WR-CALNAME:Reservations of Test User", content)
+        self.assertIn("SUMMARY:Test User (New York)", content)
+        self.assertIn(f"DTSTART:{self.day.strftime('%Y%m%d')}T090000Z", content)
+        self.assertTrue(all(line.endswith("\r") for line in content.split("\n")[:-1]))
+
+    def test_room_feed(self):
+        content = self.get_feed("room", self.other_room.pk).content.decode()
+        self.assertEqual(content.count("BEGIN:VEVENT"), 1)
+        self.assertIn("SUMMARY:Other User (Paris)", content)
+
+    def test_unknown_feed(self):
+        self.assertEqual(self.get_feed("room", 0).status_code, 404)
+
+    def test_revalidation(self):
+        response = self.get_feed("user", self.user.pk)
+        with self.assertNumQueries(0):
+            revalidated = self.get_feed("user", self.user.pk, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        with self.assertNumQueries(0):
+            revalidated = self.get_feed("user", self.user.pk, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(revalidated.status_code, 304)
+
+        Reservation.objects.create(
+            reservee=self.user,
+            room=self.other_room,
+            start_time=f"{self.day.isoformat()}T12:00:00+01:00",
+            end_time=f"{self.day.isoformat()}T13:00:00+01:00",
+        )
+        changed = self.get_feed("user", self.user.pk, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+        self.assertEqual(changed.content.decode().count("BEGIN:VEVENT"), 2)
+
+    def test_fold(self):
+        line = "SUMMARY:" + "é" * 80
+        folded = ical.fold(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split("\r\n")))
+        self.assertEqual(folded.replace("\r\n ", ""), line)
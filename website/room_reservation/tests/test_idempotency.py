@@ -0,0 +1,80 @@
+from datetime import datetime, time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+from room_reservation.views import BaseReservationView, CreateReservationView
+
+
+class IdempotencyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.room = Room.objects.create(name="New York", capacity=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def at(self, hour):
+        return timezone.make_aware(datetime.combine(self.day, time(hour)))
+
+    def create(self, key, hour=10, client=None):
+        return (client or self.client).post(
+            reverse("room_reservation:create_reservation"),
+            {"room": self.room.pk, "start_time": self.at(hour), "end_time": self.at(hour + 1)},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay(self):
+        response = self.create("first")
+        self.assertTrue(response.json()["ok"])
+        with mock.patch.object(BaseReservationView, "validate") as validate:
+            replayed = self.create("first")
+        validate.assert_not_called()
+        self.assertEqual(replayed.json(), response.json())
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_replay_delete(self):
+        pk = self.create("create").json()["pk"]
+        url = reverse("room_reservation:delete_reservation", kwargs={"pk": pk})
+        self.assertTrue(self.client.post(url, HTTP_IDEMPOTENCY_KEY="delete").json()["ok"])
+        self.assertTrue(self.client.post(url, HTTP_IDEMPOTENCY_KEY="delete").json()["ok"])
+        self.assertEqual(self.client.post(url).json()["message"], "This reservation does not exist")
+
+    def test_key_reused_for_other_request(self):
+        self.create("first")
+        response = self.create("first", hour=14)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_keys_per_user(self):
+        self.create("first")
+        client = Client()
+        client.force_login(get_user_model().objects.create_user("test2"))
+        response = self.create("first", client=client)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_retry_while_processing(self):
+        retries = []
+        create = CreateReservationView.create
+
+        def create_and_retry(view, *args):
+            retries.append(self.create("first"))
+            return create(view, *args)
+
+        with mock.patch.object(CreateReservationView, "create", create_and_retry):
+            self.assertTrue(self.create("first").json()["ok"])
+        self.assertEqual(retries[0].status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
@@ -0,0 +1,188 @@
+from datetime import datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation import rooms
+from room_reservation.models import OccupancyRollup, OccupancySlot, Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class OccupancyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1", is_staff=True)
+        cls.room = Room.objects.create(name="New York", capacity=2)
+
+    @classmethod
+    def at(cls, hour, minute=0):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour, minute)))
+
+    def rollup(self):
+        return {
+            (hour, seat_minutes, blocked_minutes)
+            for hour, seat_minutes, blocked_minutes in OccupancyRollup.objects.filter(room=self.room)
+            .exclude(seat_minutes=0, blocked_minutes=0)
+            .values_list("hour", "seat_minutes", "blocked_minutes")
+        }
+
+    def test_incremental_updates(self):
+        reservation = Reservation.objects.create(
+            reservee=self.user, room=self.room, start_time=self.at(10, 30), end_time=self.at(12)
+        )
+        Reservation.objects.create(
+            reservee=self.user, room=self.room, start_time=self.at(11), end_time=self.at(12), block_whole_room=True
+        )
+        self.assertEqual(self.rollup(), {(10, 30, 0), (11, 60, 60)})
+
+        reservation = Reservation.objects.get(pk=reservation.pk)
+        reservation.start_time = self.at(9)
+        reservation.end_time = self.at(10)
+        reservation.save()
+        self.assertEqual(self.rollup(), {(9, 60, 0), (11, 0, 60)})
+
+        reservation.delete()
+        self.assertEqual(self.rollup(), {(11, 0, 60)})
+
+    def test_bulk_updates(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.post(
+            reverse("room_reservation:batch_reservation"),
+            {
+                "operations": [
+                    {"action": "create", "room": self.room.pk, "start_time": self.at(8), "end_time": self.at(9)}
+                ]
+            },
+            content_type="application/json",
+        )
+        pk = response.json()["results"][0]["pk"]
+        client.post(
+            reverse("room_reservation:batch_reservation"),
+            {"operations": [{"action": "update", "pk": pk, "start_time": self.at(14), "end_time": self.at(15)}]},
+            content_type="application/json",
+        )
+        self.assertEqual(self.rollup(), {(14, 60, 0)})
+
+    def test_rebuild(self):
+        for hour in (9, 10, 11):
+            Reservation.objects.create(
+                reservee=self.user, room=self.room, start_time=self.at(hour), end_time=self.at(hour, 45)
+            )
+        incremental = self.rollup()
+        OccupancyRollup.objects.all().delete()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_heatmap(self):
+        Reservation.objects.create(reservee=self.user, room=self.room, start_time=self.at(10), end_time=self.at(11))
+        client = Client()
+        client.force_login(self.user)
+        rooms.get_rooms()
+        with self.assertNumQueries(3):
+            response = client.get(
+                reverse("room_reservation:occupancy"),
+                {"from": self.day.isoformat(), "to": (self.day + timedelta(days=6)).isoformat()},
+            )
+        room = response.json()["rooms"][0]
+        self.assertEqual(room["occupancy"][self.day.weekday()][10], 0.5)
+        self.assertEqual(sum(map(sum, room["occupancy"])), 0.5)
+
+    def test_heatmap_staff_only(self):
+        client = Client()
+        client.force_login(get_user_model().objects.create_user("test2"))
+        response = client.get(
+            reverse("room_reservation:occupancy"), {"from": self.day.isoformat(), "to": self.day.isoformat()}
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class OccupancySlotTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.room = Room.objects.create(name="New York", capacity=1)
+
+    def setUp(self):
+        rooms.invalidate()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @classmethod
+    def at(cls, hour, minute=0):
+        return timezone.make_aware(datetime.combine(cls.day, time(hour, minute)))
+
+    def slots(self):
+        return {
+            (timezone.localtime(start).time(), booked, blocked)
+            for start, booked, blocked in OccupancySlot.objects.filter(room=self.room)
+            .exclude(booked=0, blocked=0)
+            .values_list("start", "booked", "blocked")
+        }
+
+    def create(self, start, end):
+        return self.client.post(
+            reverse("room_reservation:create_reservation"),
+            {"room": self.room.pk, "start_time": start.isoformat(), "end_time": end.isoformat()},
+            content_type="application/json",
+        ).json()
+
+    def test_incremental_updates(self):
+        reservation = Reservation.objects.create(
+            reservee=self.user, room=self.room, start_time=self.at(10, 10), end_time=self.at(10, 40)
+        )
+        Reservation.objects.create(
+            reservee=self.user, room=self.room, start_time=self.at(10, 30), end_time=self.at(11), block_whole_room=True
+        )
+        self.assertEqual(
+            self.slots(), {(time(10), 1, 0), (time(10, 15), 1, 0), (time(10, 30), 2, 1), (time(10, 45), 1, 1)}
+        )
+
+        reservation = Reservation.objects.get(pk=reservation.pk)
+        reservation.end_time = self.at(10, 15)
+        reservation.save()
+        self.assertEqual(self.slots(), {(time(10), 1, 0), (time(10, 30), 1, 1), (time(10, 45), 1, 1)})
+
+        reservation.delete()
+        self.assertEqual(self.slots(), {(time(10, 30), 1, 1), (time(10, 45), 1, 1)})
+
+    def test_capacity(self):
+        self.assertTrue(self.create(self.at(10), self.at(11))["ok"])
+        self.client.force_login(get_user_model().objects.create_user("test2"))
+        self.assertEqual(self.create(self.at(10, 30), self.at(12))["message"], "Capacity is reached for this room")
+        self.assertEqual(
+            self.slots(), {(time(10), 1, 0), (time(10, 15), 1, 0), (time(10, 30), 1, 0), (time(10, 45), 1, 0)}
+        )
+
+    def test_partial_slots(self):
+        # Both reservations count in the slot from 11:00, but they do not overlap.
+        Reservation.objects.create(reservee=self.user, room=self.room, start_time=self.at(10), end_time=self.at(11, 5))
+        other = get_user_model().objects.create_user("test2")
+        self.client.force_login(other)
+        self.assertTrue(self.create(self.at(11, 5), self.at(12))["ok"])
+        self.assertIn((time(11), 2, 0), self.slots())
+
+    def test_verify_and_rebuild(self):
+        for hour in (9, 10, 11):
+            Reservation.objects.create(
+                reservee=self.user, room=self.room, start_time=self.at(hour), end_time=self.at(hour, 45)
+            )
+        call_command("rebuild_slots", verify=True, stdout=StringIO())
+
+        slots = self.slots()
+        OccupancySlot.objects.filter(start=self.at(10)).update(booked=0)
+        OccupancySlot.objects.filter(start=self.at(11, 30)).delete()
+        stderr = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 slots are wrong"):
+            call_command("rebuild_slots", verify=True, stdout=StringIO(), stderr=stderr)
+        self.assertIn("missing", stderr.getvalue())
+
+        call_command("rebuild_slots", stdout=StringIO())
+        self.assertEqual(self.slots(), slots)
+        call_command("rebuild_slots", verify=True, stdout=StringIO())
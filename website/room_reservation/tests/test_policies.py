@@ -0,0 +1,98 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from room_reservation import availability, rooms
+from room_reservation.models import Reservation, Room, RoomPolicy
+from room_reservation.policies import DEFAULT_POLICY
+from room_reservation.tests.test_api import next_weekday
+from room_reservation.views import BaseReservationView
+
+
+class RoomPolicyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.policy = RoomPolicy.objects.create(
+            name="Evenings",
+            opening_time=time(8),
+            closing_time=time(22),
+            open_in_weekends=True,
+            horizon=14,
+            max_duration=timedelta(hours=3),
+            max_concurrent_reservations=2,
+        )
+        cls.room = Room.objects.create(name="New York", capacity=5, policy=cls.policy)
+        cls.default_room = Room.objects.create(name="Paris", capacity=5)
+
+    def setUp(self):
+        # The registry of an earlier test may contain policies that were changed in its rolled back transaction.
+        rooms.invalidate()
+
+    @classmethod
+    def at(cls, hour, days=0):
+        return timezone.make_aware(datetime.combine(cls.day + timedelta(days=days), time(hour)))
+
+    def validate(self, room, start_time, end_time):
+        return BaseReservationView().validate(room.pk, start_time, end_time, user=self.user)
+
+    def test_default_policy(self):
+        self.assertEqual(
+            self.validate(self.default_room, self.at(19), self.at(20))[1],
+            "Please enter times between 8:00 and 18:00",
+        )
+        self.assertEqual(
+            self.validate(self.default_room, self.at(9, days=10), self.at(10, days=10))[1],
+            "You can only make reservation 1 week in advance",
+        )
+
+    def test_room_policy(self):
+        self.assertEqual(self.validate(self.room, self.at(19), self.at(21)), (True, None))
+        self.assertEqual(
+            self.validate(self.room, self.at(21), self.at(23))[1], "Please enter times between 8:00 and 22:00"
+        )
+        self.assertEqual(
+            self.validate(self.room, self.at(9), self.at(13))[1],
+            "Reservation too long. Please shorten your reservation",
+        )
+        self.assertEqual(
+            self.validate(self.room, self.at(9, days=20), self.at(10, days=20))[1],
+            "You can only make reservation 2 weeks in advance",
+        )
+
+    def test_concurrent_reservations(self):
+        Reservation.objects.create(
+            reservee=self.user, room=self.default_room, start_time=self.at(9), end_time=self.at(11)
+        )
+        self.assertEqual(self.validate(self.room, self.at(10), self.at(12)), (True, None))
+        self.assertEqual(
+            self.validate(self.default_room, self.at(10), self.at(12))[1], "You cannot reserve multiple rooms"
+        )
+
+        Reservation.objects.create(reservee=self.user, room=self.room, start_time=self.at(10), end_time=self.at(12))
+        self.assertEqual(
+            self.validate(self.room, self.at(10), self.at(11))[1],
+            "You cannot have more than 2 reservations at the same time",
+        )
+
+    def test_compiled_once(self):
+        rooms.get_rooms()
+        with self.assertNumQueries(1):
+            self.validate(self.room, self.at(19), self.at(21))
+        self.assertIs(rooms.get_policy(self.default_room.pk), DEFAULT_POLICY)
+
+        policy = RoomPolicy.objects.get(pk=self.policy.pk)
+        policy.closing_time = time(20)
+        policy.save()
+        self.assertEqual(
+            self.validate(self.room, self.at(19), self.at(21))[1], "Please enter times between 8:00 and 20:00"
+        )
+
+    def test_opening_hours(self):
+        policy = rooms.get_policy(self.room.pk)
+        intervals = availability.opening_hours(self.at(0), self.at(0, days=7), policy)
+        self.assertEqual(len(intervals), 7)
+        self.assertEqual(intervals[0], (self.at(8), self.at(21) + timedelta(minutes=59)))
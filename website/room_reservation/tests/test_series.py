@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation import rooms
+from room_reservation.models import Reservation, ReservationSeries, Room, RoomPolicy
+from room_reservation.tests.test_api import next_weekday
+
+
+class ReservationSeriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = next_weekday()
+        cls.last = timezone.localdate() + timedelta(weeks=1)
+        while cls.last.weekday() in (5, 6):
+            cls.last -= timedelta(days=1)
+        cls.weekdays = [
+            cls.first + timedelta(days=day)
+            for day in range((cls.last - cls.first).days + 1)
+            if (cls.first + timedelta(days=day)).weekday() not in (5, 6)
+        ]
+
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.other_user = get_user_model().objects.create_user("test2")
+
+        cls.room = Room.objects.create(name="New York", capacity=1)
+
+    @classmethod
+    def at(cls, date, hour):
+        return timezone.make_aware(datetime.combine(date, time(hour)))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_series(self, frequency, until, hour=10, room=None):
+        return self.client.post(
+            reverse("room_reservation:create_reservation"),
+            {
+                "room": (room or self.room).pk,
+                "start_time": self.at(self.first, hour),
+                "end_time": self.at(self.first, hour + 2),
+                "recurrence": {"frequency": frequency, "until": until.isoformat()},
+            },
+            content_type="application/json",
+        )
+
+    def test_daily_series(self):
+        response = self.create_series("daily", self.last)
+        self.assertTrue(response.json()["ok"])
+        series = ReservationSeries.objects.get(pk=response.json()["series"])
+        self.assertEqual(
+            list(series.reservation_set.order_by("start_time").values_list("start_time", flat=True)),
+            [self.at(day, 10) for day in self.weekdays],
+        )
+
+    def test_weekly_series_within_horizon(self):
+        response = self.create_series("weekly", self.first + timedelta(weeks=2))
+        self.assertContains(response, "You can only make reservation 1 week in advance")
+        self.assertFalse(ReservationSeries.objects.exists())
+
+    def test_weekly_series_within_room_horizon(self):
+        policy = RoomPolicy.objects.create(name="Four weeks", horizon=28)
+        room = Room.objects.create(name="Paris", capacity=1, policy=policy)
+        rooms.invalidate()
+        response = self.create_series("weekly", self.first + timedelta(weeks=3), room=room)
+        self.assertTrue(response.json()["ok"])
+        self.assertEqual(Reservation.objects.filter(series=response.json()["series"]).count(), 4)
+
+    def test_series_collision(self):
+        Reservation.objects.create(
+            reservee=self.other_user,
+            room=self.room,
+            start_time=self.at(self.last, 11),
+            end_time=self.at(self.last, 12),
+        )
+        # Session, user, two savepoints, two locks and one query for all occurrences.
+        with self.assertNumQueries(7):
+            response = self.create_series("daily", self.last)
+        self.assertContains(response, f"Capacity is reached for this room (on {self.last:%A}")
+        self.assertFalse(Reservation.objects.filter(reservee=self.user).exists())
+
+    def test_delete_series(self):
+        series = self.create_series("daily", self.last).json()["series"]
+        response = self.client.post(reverse("room_reservation:delete_series", kwargs={"pk": series}))
+        self.assertEqual(response.json(), {"ok": True, "deleted": len(self.weekdays)})
+        self.assertFalse(ReservationSeries.objects.exists())
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_delete_series_other_user(self):
+        series = self.create_series("daily", self.last).json()["series"]
+        self.client.force_login(self.other_user)
+        response = self.client.post(reverse("room_reservation:delete_series", kwargs={"pk": series}))
+        self.assertContains(response, "You can only delete your own events")
+        self.assertEqual(Reservation.objects.count(), len(self.weekdays))
+
+    def test_bad_recurrence(self):
+        response = self.create_series("hourly", self.last)
+        self.assertEqual(response.status_code, 400)
+
+    def test_malformed_recurrence(self):
+        for recurrence in ("weekly", ["weekly"], {"frequency": "weekly", "until": 20210301}):
+            response = self.client.post(
+                reverse("room_reservation:create_reservation"),
+                {
+                    "room": self.room.pk,
+                    "start_time": self.at(self.first, 10),
+                    "end_time": self.at(self.first, 12),
+                    "recurrence": recurrence,
+                },
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import queue
+import threading
+from datetime import datetime, time
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from room_reservation.changes import PostgresBroker, Stream
+from room_reservation.models import Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+from sagexit.asgi import application
+
+
+# Changes are published when the transaction commits, which never happens in a TestCase.
+@mock.patch.object(Stream, "lifetime", 0.2)
+class ChangeStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.day = next_weekday()
+        self.user = get_user_model().objects.create_user("test1", first_name="Jane", last_name="Doe")
+        self.room = Room.objects.create(name="New York", capacity=2)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def at(self, hour):
+        return timezone.make_aware(datetime.combine(self.day, time(hour)))
+
+    def open_stream(self, start, end, **params):
+        response = Client().get(
+            reverse("room_reservation:stream"), {"start": start.isoformat(), "end": end.isoformat(), **params}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return response
+
+    def read(self, response):
+        return [
+            json.loads(line[len("data: ") :])
+            for line in b"".join(response.streaming_content).decode().splitlines()
+            if line.startswith("data: ")
+        ]
+
+    def create(self, hour):
+        return self.client.post(
+            reverse("room_reservation:create_reservation"),
+            {"room": self.room.pk, "start_time": self.at(hour), "end_time": self.at(hour + 1)},
+            content_type="application/json",
+        ).json()["pk"]
+
+    def test_changes(self):
+        response = self.open_stream(self.at(8), self.at(18))
+        pk = self.create(10)
+        self.client.post(
+            reverse("room_reservation:update_reservation", kwargs={"pk": pk}),
+            {"room": self.room.pk, "start_time": self.at(11), "end_time": self.at(12)},
+            content_type="application/json",
+        )
+        self.client.post(reverse("room_reservation:delete_reservation", kwargs={"pk": pk}))
+
+        created, updated, deleted = self.read(response)
+        self.assertEqual(created["action"], "create")
+        self.assertEqual(created["event"]["title"], "Jane Doe (New York)")
+        self.assertFalse(created["event"]["editable"])
+        self.assertEqual(updated["action"], "update")
+        self.assertEqual(updated["event"]["start"], self.at(11).isoformat())
+        self.assertEqual(deleted, {"action": "delete", "pk": pk})
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_failed_delete_not_published(self):
+        pk = self.create(10)
+        response = self.open_stream(self.at(8), self.at(18))
+        with mock.patch("django.db.models.query.QuerySet.delete", side_effect=RuntimeError), self.assertRaises(
+            RuntimeError
+        ):
+            self.client.post(reverse("room_reservation:delete_reservation", kwargs={"pk": pk}))
+        self.assertEqual(self.read(response), [])
+        self.assertTrue(Reservation.objects.filter(pk=pk).exists())
+
+    def test_range(self):
+        response = self.open_stream(self.at(8), self.at(11))
+        other_room = self.open_stream(self.at(8), self.at(18), room=self.room.pk + 1)
+        self.create(12)
+        pk = self.create(9)
+        self.client.post(
+            reverse("room_reservation:update_reservation", kwargs={"pk": pk}),
+            {"room": self.room.pk, "start_time": self.at(14), "end_time": self.at(15)},
+            content_type="application/json",
+        )
+
+        created, moved_out = self.read(response)
+        self.assertEqual((created["action"], created["pk"]), ("create", pk))
+        self.assertEqual(moved_out, {"action": "delete", "pk": pk})
+        self.assertEqual(self.read(other_room), [{"action": "delete", "pk": pk}])
+
+    @override_settings(WSGI_CHANGE_STREAMS=False)
+    def test_no_content_under_wsgi(self):
+        response = Client().get(
+            reverse("room_reservation:stream"), {"start": self.at(8).isoformat(), "end": self.at(18).isoformat()}
+        )
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(WSGI_CHANGE_STREAMS=False)
+    @mock.patch.object(Stream, "lifetime", 1)
+    def test_asgi(self):
+        opened = threading.Event()
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+            if message.get("body", b"").startswith(b"retry:"):
+                opened.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": reverse("room_reservation:stream"),
+            "query_string": urlencode({"start": self.at(8).isoformat(), "end": self.at(18).isoformat()}).encode(),
+            "headers": [],
+            "server": ("testserver", 80),
+        }
+        server = threading.Thread(target=asyncio.run, args=(application(scope, receive, send),))
+        server.start()
+        self.assertTrue(opened.wait(5))
+        pk = self.create(10)
+        server.join()
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertIn((b"Content-Type", b"text/event-stream"), messages[0]["headers"])
+        body = b"".join(message.get("body", b"") for message in messages[1:]).decode()
+        self.assertIn(f'"pk": {pk}', body)
+        self.assertFalse(messages[-1].get("more_body", False))
+
+
+class PostgresBrokerTest(SimpleTestCase):
+    def test_invalid_notifications_logged(self):
+        broker = PostgresBroker()
+        subscriber = queue.Queue()
+        broker.subscribers.add(subscriber)
+        with self.assertLogs("room_reservation.changes", "ERROR"):
+            broker.notify("not json")
+        broker.notify(json.dumps({"action": "delete", "pk": 1}))
+        self.assertEqual(subscriber.get_nowait(), {"action": "delete", "pk": 1})
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from room_reservation.models import ArchivedReservation, OccupancyRollup, Reservation, Room
+from room_reservation.tests.test_api import next_weekday
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = next_weekday()
+        cls.user = get_user_model().objects.create_user("test1")
+        cls.other_user = get_user_model().objects.create_user("test2")
+        cls.room = Room.objects.create(name="New York", capacity=1)
+        cls.other_room = Room.objects.create(name="Paris", capacity=2)
+
+    @classmethod
+    def at(cls, hour, days=0):
+        return timezone.make_aware(datetime.combine(cls.day + timedelta(days=days), time(hour)))
+
+    def write(self, content, suffix):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False)
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def import_file(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_reservations", path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv(self):
+        path = self.write(
+            "reservee,room,start_time,end_time,block_whole_room\n"
+            f"test1,New York,{self.at(10).isoformat()},{self.at(11).isoformat()},false\n"
+            f"test2,New York,{self.at(10).isoformat()},{self.at(12).isoformat()},false\n"
+            f"test2,Paris,{self.at(10).isoformat()},{self.at(12).isoformat()},\n"
+            f"test3,Paris,{self.at(10).isoformat()},{self.at(12).isoformat()},false\n"
+            f"test1,Tokyo,{self.at(10).isoformat()},{self.at(12).isoformat()},false\n"
+            f"test1,Paris,{self.at(12).isoformat()},{self.at(11).isoformat()},false\n"
+            f"test1,Paris,tomorrow,{self.at(11).isoformat()},false\n",
+            ".csv",
+        )
+        stdout, stderr = self.import_file(path, "--chunk-size", "3")
+        self.assertIn("Imported 2 reservations, rejected 5", stdout)
+        self.assertEqual(
+            stderr.splitlines(),
+            [
+                "Line 3: Capacity is reached for this room",
+                "Line 5: Unknown user: test3",
+                "Line 6: Unknown or ambiguous room: Tokyo",
+                "Line 7: Start time needs to be before end time",
+                "Line 8: Invalid time: tomorrow",
+            ],
+        )
+        self.assertEqual(
+            set(Reservation.objects.values_list("reservee__username", "room__name")),
+            {("test1", "New York"), ("test2", "Paris")},
+        )
+        self.assertTrue(OccupancyRollup.objects.filter(room=self.room, seat_minutes=60).exists())
+
+    def test_import_validates_against_existing(self):
+        Reservation.objects.create(
+            reservee=self.user,
+            room=self.other_room,
+            start_time=self.at(9),
+            end_time=self.at(12),
+            block_whole_room=True,
+        )
+        path = self.write(
+            json.dumps(
+                {"reservee": "test2", "room": "Paris", "start_time": self.at(10), "end_time": self.at(11)}, default=str
+            )
+            + "\n",
+            ".jsonl",
+        )
+        stdout, stderr = self.import_file(path)
+        self.assertIn("Imported 0 reservations, rejected 1", stdout)
+        self.assertIn("This room is blocked.", stderr)
+
+    def test_dry_run(self):
+        path = self.write(
+            f"reservee,room,start_time,end_time\ntest1,Paris,{self.at(10).isoformat()},{self.at(11).isoformat()}\n",
+            ".csv",
+        )
+        stdout, _ = self.import_file(path, "--dry-run")
+        self.assertIn("Validated 1 reservations, rejected 0", stdout)
+        self.assertFalse(Reservation.objects.exists())
+
+    def round_trip(self, suffix):
+        Reservation.objects.create(reservee=self.user, room=self.room, start_time=self.at(10), end_time=self.at(11))
+        Reservation.objects.create(
+            reservee=self.other_user, room=self.other_room, start_time=self.at(9), end_time=self.at(12)
+        )
+        ArchivedReservation.objects.create(
+            reservee=self.user, room=self.room, start_time=self.at(10, days=-400), end_time=self.at(11, days=-400)
+        )
+        fields = ("reservee", "room", "start_time", "end_time", "block_whole_room")
+        exported = {
+            *Reservation.objects.values_list(*fields),
+            *ArchivedReservation.objects.values_list(*fields),
+        }
+
+        path = self.write("", suffix)
+        call_command("export_reservations", "--output", path, "--archived", stderr=StringIO())
+        Reservation.objects.all().delete()
+        stdout, _ = self.import_file(path)
+        self.assertIn("Imported 3 reservations, rejected 0", stdout)
+        self.assertEqual(set(Reservation.objects.values_list(*fields)), exported)
+
+    def test_round_trip_csv(self):
+        self.round_trip(".csv")
+
+    def test_round_trip_jsonl(self):
+        self.round_trip(".jsonl")
+
+    def test_export_filters(self):
+        Reservation.objects.create(reservee=self.user, room=self.room, start_time=self.at(10), end_time=self.at(11))
+        Reservation.objects.create(
+            reservee=self.user, room=self.other_room, start_time=self.at(9), end_time=self.at(10)
+        )
+        stdout = StringIO()
+        call_command("export_reservations", "--format", "jsonl", "--room", "Paris", stdout=stdout, stderr=StringIO())
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([(row["reservee"], row["room"]) for row in rows], [("test1", "Paris")])
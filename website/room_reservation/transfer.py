@@ -0,0 +1,89 @@
+"""
+Reading and writing reservations as CSV or JSON lines, for `manage.py import_reservations` and `export_reservations`.
+
+Every row contains the `reservee` (username), the `room` (name), the `start_time` and `end_time` (ISO 8601) and
+whether it blocks the whole room. Exports also contain the primary key and the series of each reservation, which
+imports ignore. Rows are read and written one at a time, so files of any size are streamed.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import dateparse, timezone
+
+FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = ("pk", "reservee", "room", "start_time", "end_time", "block_whole_room", "series")
+EXPORT_FIELDS = ("pk", "reservee__username", "room__name", "start_time", "end_time", "block_whole_room", "series_id")
+
+
+def guess_format(path):
+    """Return the format of a file, based on its extension."""
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(file, format):
+    """Yield the line number and contents of every row in a file."""
+    if format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+
+def write_rows(file, format, rows):
+    """Write rows with the values of `EXPORT_COLUMNS` to a file and return the number of rows."""
+    count = 0
+    if format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(value.isoformat() if hasattr(value, "isoformat") else value for value in row)
+            count += 1
+    else:
+        for row in rows:
+            file.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) + "\n")
+            count += 1
+    return count
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 datetime, which is in the current timezone if it has no offset."""
+    parsed = dateparse.parse_datetime(value or "")
+    if parsed is None:
+        raise ValueError(f"Invalid time: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bool(value):
+    """Parse a boolean, which is false if it is missing."""
+    if isinstance(value, bool):
+        return value
+    if value is None or str(value).strip().lower() in ("", "0", "false", "no"):
+        return False
+    if str(value).strip().lower() in ("1", "true", "yes"):
+        return True
+    raise ValueError(f"Invalid boolean: {value}")
+
+
+def parse_row(row):
+    """Return the reservee, room, start time, end time and blocking of a row, or raise ValueError if it is invalid."""
+    if not isinstance(row, dict):
+        raise ValueError("Invalid row")
+    for column in ("reservee", "room"):
+        if not row.get(column):
+            raise ValueError(f"Missing {column}")
+    return (
+        str(row["reservee"]),
+        str(row["room"]),
+        parse_datetime(row.get("start_time")),
+        parse_datetime(row.get("end_time")),
+        parse_bool(row.get("block_whole_room")),
+    )
@@ -1,7 +1,15 @@
 from django.urls import path
 
+from .views import AvailabilityView
+from .views import BatchReservationView
 from .views import CreateReservationView
 from .views import DeleteReservationView
+from .views import DeleteSeriesView
+from .views import ICalendarView
+from .views import OccupancyView
+from .views import ReplaceFeedKeyView
+from .views import ReservationEventsView
+from .views import ReservationStreamView
 from .views import ShowCalendarView
 from .views import UpdateReservationView
 
@@ -9,7 +17,15 @@ app_name = "room_reservation"
 
 urlpatterns = [
     path("", ShowCalendarView.as_view(), name="calendar"),
+    path("events", ReservationEventsView.as_view(), name="events"),
+    path("stream", ReservationStreamView.as_view(), name="stream"),
+    path("availability", AvailabilityView.as_view(), name="availability"),
+    path("feeds/<str:token>.ics", ICalendarView.as_view(), name="ical"),
+    path("feeds/replace", ReplaceFeedKeyView.as_view(), name="replace_feed_key"),
+    path("occupancy", OccupancyView.as_view(), name="occupancy"),
     path("create", CreateReservationView.as_view(), name="create_reservation"),
+    path("batch", BatchReservationView.as_view(), name="batch_reservation"),
     path("<int:pk>/update", UpdateReservationView.as_view(), name="update_reservation"),
     path("<int:pk>/delete", DeleteReservationView.as_view(), name="delete_reservation"),
+    path("series/<int:pk>/delete", DeleteSeriesView.as_view(), name="delete_series"),
 ]
@@ -1,20 +1,39 @@
 import json
-from datetime import timedelta
-from json import JSONDecodeError
-
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
-from django.http import HttpResponseBadRequest, JsonResponse
+import random
+from datetime import datetime, time, timedelta
+from functools import update_wrapper
+from hashlib import md5
+from time import sleep
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core import signing
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.db.models import Exists, Q, Sum
+from django.db.models.functions import ExtractIsoWeekDay
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
 from django.utils import dateparse, timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.views import View
 from django.views.generic import TemplateView
 
-from .models import Reservation, Room
+from . import availability, changes, events, ical, occupancy, rooms
+from .idempotency import IdempotentMixin
+from .models import OccupancyRollup, Reservation, ReservationSeries, Room
+from .signals import bulk_changed
 
 
 class BaseReservationView(View):
     """Base class for reservation API endpoints."""
 
+    write_attempts = 5
+
     def validate(self, room, start_time, end_time, pk=None, user=None):
         """
         Validate the input for the reservation.
@@ -22,76 +41,187 @@ class BaseReservationView(View):
         By checking:
 
         - All checks made by ModelForm.
+        - Reservation follows the policy of the room.
         - Reservation does not collide with another reservation.
-        - Reservation is not too long.
         """
-        start_time = start_time.astimezone(timezone.get_current_timezone())
-        end_time = end_time.astimezone(timezone.get_current_timezone())
+        room = rooms.get_room(room)
+        if room is None:
+            return False, "This room does not exist"
+
+        policy = rooms.get_policy(room.pk)
+        message = policy.check_times(start_time, end_time)
+        if message is not None:
+            return False, message
+
+        reservations = Reservation.objects.filter(start_time__lt=end_time, end_time__gt=start_time)
+        if pk is not None:
+            reservations = reservations.exclude(pk=pk)
+
+        # Fetch all overlapping reservations of the user at once with those in the room, which are only needed when
+        # the slots of the room show it may be full or blocked.
+        crowded = occupancy.crowded_slots(room.pk, start_time, end_time, room.capacity)
+        reservations = reservations.filter(Q(Exists(crowded), room_id=room.pk) | Q(reservee=user))
+
+        user_overlaps = 0
+        overlapping = []
+        for room_id, reservee_id, start, end, blocked in reservations.values_list(
+            "room_id", "reservee_id", "start_time", "end_time", "block_whole_room"
+        ):
+            if user is not None and reservee_id == user.pk:
+                user_overlaps += 1
+            if room_id == room.pk:
+                overlapping.append((start, end, blocked))
+
+        message = self.check_overlaps(policy, room.capacity, user_overlaps, overlapping)
+        if message is not None:
+            return False, message
+        return True, None
 
-        if end_time.date() > timezone.now().date() + timezone.timedelta(weeks=1):
-            return False, "You can only make reservation 1 week in advance"
+    def check_overlaps(self, policy, capacity, user_overlaps, overlapping):
+        """
+        Return why a reservation collides with other reservations, or None if it does not.
 
-        if end_time.date() - start_time.date() >= timezone.timedelta(days=1):
-            return False, "Reservation too long. Please shorten your reservation"
+        `user_overlaps` is the number of reservations of the user that overlap the reservation, and `overlapping`
+        contains the (start_time, end_time, block_whole_room) of all reservations in the room that overlap it.
+        """
+        message = policy.check_concurrent(user_overlaps)
+        if message is not None:
+            return message
 
-        if start_time >= end_time:
-            return False, "Start time needs to be before end time"
+        if any(blocked for _, _, blocked in overlapping):
+            return "This room is blocked."
 
-        if start_time.hour < 8 or start_time.hour >= 18 or end_time.hour < 8 or end_time.hour >= 18:
-            return False, "Please enter times between 8:00 and 18:00"
+        if availability.max_simultaneous(overlapping) >= capacity:
+            return "Capacity is reached for this room"
+        return None
 
-        if start_time.weekday() in (5, 6):
-            return False, "Rooms cannot be reserved in the weekends"
+    def check_update(self, reservation, start_time, end_time):
+        """Return why the reservation cannot be moved to the new times, or None if it can."""
+        # If the event took place in the past
+        if reservation.start_time < reservation.end_time < timezone.now():
+            if reservation.start_time == start_time and end_time > timezone.now():  # We can only extend the end time
+                pass
+            else:
+                return "You cannot update events from the past"
 
-        overlapping_same_user = (
-            Reservation.objects.filter(reservee=user)
-            .filter(
-                Q(start_time__lte=start_time, end_time__gt=start_time)
-                | Q(start_time__lt=end_time, end_time__gte=end_time)
-                | Q(start_time__gte=start_time, end_time__lte=end_time)
-            )
-            .exclude(pk=pk)
-        )
+        # If the event is active
+        if reservation.start_time < timezone.now() < reservation.end_time:
+            if (
+                reservation.start_time == start_time and end_time > timezone.now()
+            ):  # We can only change the end time to the future
+                pass
+            else:
+                return "You cannot change the start or end time to this value"
 
-        if overlapping_same_user.count() >= 1:
-            return False, "You cannot reserve multiple rooms"
+        # If the event is in the future
+        if timezone.now() < reservation.start_time < reservation.end_time:
+            if start_time < timezone.now():  # We cannot change the start time to the past
+                return "You cannot change the start time to this value"
 
-        overlapping_reservations = (
-            Reservation.objects.filter(room=room)
-            .filter(
-                Q(start_time__lte=start_time, end_time__gt=start_time)
-                | Q(start_time__lt=end_time, end_time__gte=end_time)
-                | Q(start_time__gte=start_time, end_time__lte=end_time)
-            )
-            .exclude(pk=pk)
+        return None
+
+    def check_delete(self, reservation):
+        """Return why the reservation cannot be deleted, or None if it can."""
+        if reservation.start_time < reservation.end_time < timezone.now():
+            return "You cannot remove events from the past"
+
+        if reservation.start_time < timezone.now() < reservation.end_time:
+            return "You cannot remove this active event"
+
+        return None
+
+    def check_move(self, reservations, capacities, room, start_time, end_time, reservation=None):
+        """
+        Return why a reservation cannot take place at these times in a snapshot, or None if it can.
+
+        The snapshot consists of `reservations`, which contains all reservations in the room and of the user that
+        may overlap, and `capacities`, which maps the room ids to their capacity. This validates the same as
+        `validate` without querying the database, so many reservations can be validated at once.
+        """
+        if room not in capacities:
+            return "This room does not exist"
+
+        policy = rooms.get_policy(room)
+        message = policy.check_times(start_time, end_time)
+        if message is not None:
+            return message
+
+        others = [
+            other
+            for other in reservations
+            if other is not reservation and other.start_time < end_time and other.end_time > start_time
+        ]
+        return self.check_overlaps(
+            policy,
+            capacities[room],
+            sum(other.reservee_id == self.request.user.pk for other in others),
+            [(other.start_time, other.end_time, other.block_whole_room) for other in others if other.room_id == room],
         )
 
-        if overlapping_reservations.filter(block_whole_room=True).exists():
-            return False, "This room is blocked."
+    def lock(self, user, *rooms):
+        """
+        Lock the rows of the user and the rooms until the end of the transaction and return the room capacities.
 
-        start_times = sorted(overlapping_reservations.values_list("start_time"))
-        end_times = sorted(overlapping_reservations.values_list("end_time"))
+        This serializes the writes of one user and the writes to one room, while writes to different rooms by
+        different users never wait for each other. The user is always locked first and the rooms in order of their
+        primary key to prevent deadlocks. Locking happens before validating, as a query that waits for a lock does
+        not see rows committed in the meantime.
+        """
+        list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list("pk"))
+        return dict(Room.objects.select_for_update().filter(pk__in=rooms).order_by("pk").values_list("pk", "capacity"))
 
-        i = 1
-        j = 0
+    def lock_reservations(self, user, pks, *rooms):
+        """
+        Lock the user, the rooms and the rooms of the reservations and return the capacities and the reservations.
 
-        simultaneous = 1
-        max_overlapping = 1
-        while i < len(start_times) and j < len(start_times):
-            if start_times[i] < end_times[j]:
-                simultaneous += 1
-                if simultaneous > max_overlapping:
-                    max_overlapping = simultaneous
-                i += 1
-            else:
-                simultaneous -= 1
-                j += 1
+        The reservations are read again with their rows locked after their rooms are locked, so they cannot change
+        until the end of the transaction. If a reservation moved to another room in the meantime, that room is locked
+        as well.
+        """
+        pks = set(pks)
+        capacities = self.lock(
+            user, *rooms, *Reservation.objects.filter(pk__in=pks).values_list("room_id", flat=True).distinct()
+        )
+        while True:
+            reservations = Reservation.objects.select_for_update().in_bulk(pks)
+            moved = {reservation.room_id for reservation in reservations.values()} - set(capacities)
+            if not moved:
+                return capacities, reservations
+            capacities.update(self.lock(user, *moved))
+
+    def insert(self, reservations):
+        """
+        Insert the reservations, with a single query where possible.
 
-        capacity_reached = max_overlapping >= Room.objects.get(id=room).capacity
+        Backends that cannot return the primary keys of a bulk insert save the reservations one by one instead.
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            Reservation.objects.bulk_create(reservations)
+            bulk_changed(added=[occupancy.state(reservation) for reservation in reservations])
+        else:
+            for reservation in reservations:
+                reservation.save()
+
+    def publish(self, action, *reservations):
+        """Publish that the reservations of the logged in user are created, updated or deleted."""
+        for reservation in reservations:
+            changes.publish(action, reservation, self.request.user)
+
+    def write(self, func, *args):
+        """
+        Run func in a transaction and return its result.
 
-        if capacity_reached:
-            return False, "Capacity is reached for this room"
-        return True, None
+        The transaction is retried a few times, with exponential backoff, when it fails because of a lock conflict
+        with another transaction (a serialization failure or deadlock on Postgres, a locked database on SQLite).
+        """
+        for attempt in range(1, self.write_attempts + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args)
+            except OperationalError:
+                if attempt == self.write_attempts:
+                    raise
+                sleep(random.uniform(0, 0.01 * 2**attempt))
 
     def load_json(self):
         """Extract the json data from text_body."""
@@ -101,9 +231,54 @@ class BaseReservationView(View):
         end_time = dateparse.parse_datetime(body["end_time"])
         return room, start_time, end_time
 
+    def parse_range_param(self, name):
+        """Parse a date or datetime query parameter into an aware datetime."""
+        value = self.request.GET[name]
+        parsed = dateparse.parse_datetime(value)
+        if parsed is None:
+            date = dateparse.parse_date(value)
+            if date is None:
+                raise ValueError(f"Invalid date: {value}")
+            parsed = datetime.combine(date, time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
     def can_edit(self, reservation):
-        """Return true if the reservation can be edited by the logged in user."""
-        return self.request.user == reservation.reservee
+        """Return true if the reservation (or series) can be edited by the logged in user."""
+        return self.request.user.pk == reservation.reservee_id
+
+
+class AsyncReservationView(BaseReservationView):
+    """
+    Base class for read-only API endpoints with async handlers.
+
+    Under ASGI these handlers run in the event loop and only occupy a thread for their database work (with
+    `sync_to_async`), so slow clients and long-lived responses do not tie up a worker. Under WSGI, Django runs them
+    in an event loop of their own.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Return the view as a coroutine function, so Django awaits it instead of running it in a thread."""
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return update_wrapper(async_view, view)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        """Respond to other methods than the handlers support."""
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        """Respond to the OPTIONS method."""
+        return super().options(request, *args, **kwargs)
+
+    async def get_user_id(self):
+        """Return the primary key of the logged in user (or None), loading the session and user if needed."""
+        return await sync_to_async(lambda: self.request.user.pk)()
 
 
 class ShowCalendarView(TemplateView, BaseReservationView):
@@ -119,32 +294,326 @@ class ShowCalendarView(TemplateView, BaseReservationView):
     def get_context_data(self, **kwargs):
         """Load all information for the calendar."""
         context = super(ShowCalendarView, self).get_context_data(**kwargs)
+        context["rooms"] = rooms.get_rooms().values()
+        context["room_names"] = {room.pk: room.name for room in context["rooms"]}
+        if self.request.user.is_authenticated:
+            user_id = self.request.user.pk
+            key = ical.get_or_create_key(user_id)
+            context["room_feeds"] = [
+                (room, reverse("room_reservation:ical", kwargs={"token": ical.token("room", room.pk, user_id, key)}))
+                for room in context["rooms"]
+            ]
+            context["user_feed"] = reverse(
+                "room_reservation:ical", kwargs={"token": ical.token("user", user_id, user_id, key)}
+            )
+        return context
 
-        context["reservations"] = json.dumps(
-            [
-                {
-                    "pk": reservation.pk,
-                    "title": f"{reservation.reservee.get_full_name()} ({reservation.room.name})"
-                    if not reservation.block_whole_room
-                    else f"{reservation.room.name} BLOCKED",
-                    "reservee": reservation.reservee.get_full_name(),
-                    "room": reservation.room_id,
-                    "start": reservation.start_time.isoformat(),
-                    "end": reservation.end_time.isoformat(),
-                    "editable": self.can_edit(reservation),
-                }
-                for reservation in Reservation.objects.filter(
-                    start_time__date__gte=timezone.now() - timedelta(days=60),
-                    start_time__date__lt=timezone.now() + timedelta(days=60),
+
+class ReplaceFeedKeyView(LoginRequiredMixin, BaseReservationView):
+    """Replace the feed key of the logged in user, which revokes the links to all their calendar feeds."""
+
+    def post(self, request, *args, **kwargs):
+        """Handle the POST method for this view."""
+        ical.replace_key(request.user.pk)
+        return redirect("room_reservation:calendar")
+
+
+class ReservationEventsView(AsyncReservationView):
+    """
+    Return the reservations in a time range as calendar events.
+
+    This is used as the event source of the calendar, which requests the visible range using the `start` and
+    `end` query parameters, optionally limited to one `room`. The range is capped to `max_range` after `start`.
+
+    With `format=compact` as query parameter or the compact media type in the Accept header, the events are returned
+    in the compact format of `events.compact` instead.
+
+    Events are served per whole week from the cache. The response has an ETag based on the reservation version,
+    so clients revalidating an unchanged range get a 304 response without any database query. The events are
+    encoded while the response is streamed, so the whole JSON document is never held in memory.
+    """
+
+    max_range = timedelta(weeks=6)
+
+    async def get(self, request, *args, **kwargs):
+        """Handle the GET method for this view."""
+        try:
+            start = self.parse_range_param("start")
+            end = self.parse_range_param("end")
+            room = int(request.GET["room"]) if request.GET.get("room") else None
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        weeks = events.weeks_between(start, min(end, start + self.max_range))
+        compact = request.GET.get("format") == "compact" or events.COMPACT_MEDIA_TYPE in request.META.get(
+            "HTTP_ACCEPT", ""
+        )
+        user_id = await self.get_user_id()
+        version = await sync_to_async(events.get_version)()
+        etag = quote_etag(
+            md5(f"{version}:{user_id}:{room}:{weeks[0].date()}:{len(weeks)}:{compact}".encode()).hexdigest()
+            if weeks
+            else f"empty-{compact}"
+        )
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            reservations = await sync_to_async(events.get_week_events)(weeks, room, version)
+            if compact:
+                response = StreamingHttpResponse(
+                    events.compact(reservations, user_id), content_type=events.COMPACT_MEDIA_TYPE
                 )
-            ]
+            else:
+                response = StreamingHttpResponse(
+                    events.json_array(events.verbose(reservations, user_id)), content_type="application/json"
+                )
+            response["ETag"] = etag
+        patch_vary_headers(response, ["Accept"])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ICalendarView(BaseReservationView):
+    """
+    Return the reservations of a user or in a room as an iCalendar feed, for calendar apps.
+
+    The feed is identified by a signed token (see `ical.token`) and contains the reservations from `history` ago
+    until the end of the reservation horizon. Feeds are cached until a reservation changes and are served with an
+    ETag and Last-Modified date, so revalidating an unchanged feed only costs a few cache lookups.
+    """
+
+    history = timedelta(weeks=4)
+    horizon = timedelta(weeks=1, days=1)
+
+    def get(self, request, token, *args, **kwargs):
+        """Handle the GET method for this view."""
+        try:
+            feed, pk = ical.unsign(token)
+        except signing.BadSignature:
+            raise Http404("This feed does not exist")
+
+        # The feed covers a different range every day.
+        key = f"room_reservation:ical:{events.get_version()}:{feed}:{pk}:{timezone.localdate().isoformat()}"
+        etag = quote_etag(md5(key.encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            cached = cache.get(key)
+            if cached is None:
+                cached = (self.generate(feed, pk, request.get_host()), int(timezone.now().timestamp()))
+                cache.set(key, cached, events.EVENTS_TIMEOUT)
+            content, last_modified = cached
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = HttpResponse(content, content_type="text/calendar; charset=utf-8")
+            response["Last-Modified"] = http_date(last_modified)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def generate(self, feed, pk, host):
+        """Return the iCalendar document of a feed."""
+        now = timezone.now()
+        reservations = Reservation.objects.filter(start_time__lt=now + self.horizon, end_time__gt=now - self.history)
+        if feed == "user":
+            names = get_user_model().objects.filter(pk=pk).values_list("first_name", "last_name").first()
+            if names is None:
+                raise Http404("This feed does not exist")
+            name = f"Reservations of {' '.join(names).strip()}"
+            reservations = reservations.filter(reservee_id=pk)
+        else:
+            room = rooms.get_room(pk)
+            if room is None:
+                raise Http404("This feed does not exist")
+            name = f"Reservations of {room.name}"
+            reservations = reservations.filter(room_id=pk)
+
+        return ical.calendar(
+            name,
+            (
+                (
+                    reservation["pk"],
+                    events.serialize(reservation)["title"],
+                    reservation["start_time"],
+                    reservation["end_time"],
+                )
+                for reservation in reservations.order_by("start_time").values(*events.EVENT_FIELDS).iterator()
+            ),
+            host,
         )
-        context["rooms"] = Room.objects.all()
-        return context
 
 
-class CreateReservationView(LoginRequiredMixin, BaseReservationView):
-    """View to make a reservation."""
+class ReservationStreamView(AsyncReservationView):
+    """
+    Stream the changes of the reservations in a time range as server-sent events.
+
+    The time range and room are given like for ReservationEventsView. Each `change` event contains the `action`
+    (create, update or delete), the `pk` of the reservation and, unless it is deleted, the reservation as calendar
+    `event`. The stream ends after a few minutes, after which the browser reconnects.
+
+    Under the ASGI handler of `sagexit.asgi`, the stream waits for changes in the event loop, so an open stream
+    does not occupy a thread. Under WSGI it would occupy a thread for minutes, so the view responds with No Content
+    instead, unless `WSGI_CHANGE_STREAMS` is enabled.
+    """
+
+    max_range = timedelta(weeks=6)
+
+    async def get(self, request, *args, **kwargs):
+        """Handle the GET method for this view."""
+        try:
+            start = self.parse_range_param("start")
+            end = min(self.parse_range_param("end"), start + self.max_range)
+            room = int(request.GET["room"]) if request.GET.get("room") else None
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        if getattr(request, "async_streaming", False):
+            user_id = await self.get_user_id()
+            response = StreamingHttpResponse((), content_type="text/event-stream")
+            response.async_streaming_content = changes.AsyncStream(start, end, room, user_id)
+        elif not settings.WSGI_CHANGE_STREAMS:
+            # No Content tells the browser to stop reconnecting, so the calendar just does not update live.
+            return HttpResponse(status=204)
+        else:
+            user_id = await self.get_user_id()
+            response = StreamingHttpResponse(
+                changes.Stream(start, end, room, user_id), content_type="text/event-stream"
+            )
+        patch_cache_control(response, no_cache=True)
+        # Tell nginx not to buffer the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class AvailabilityView(AsyncReservationView):
+    """
+    Return the free time slots of all rooms in a time range.
+
+    The range is given by the `from` and `to` query parameters and capped to `max_range`, and `duration` is the
+    minimal length of a slot in minutes. A slot is free when the room is not blocked, has capacity left and is
+    open according to its policy, so a reservation fitting in the slot passes `validate` (unless the user has other
+    reservations or it is beyond the horizon of the policy).
+    """
+
+    max_range = timedelta(weeks=2)
+
+    async def get(self, request, *args, **kwargs):
+        """Handle the GET method for this view."""
+        try:
+            start = max(self.parse_range_param("from"), timezone.now())
+            end = min(self.parse_range_param("to"), start + self.max_range)
+            duration = timedelta(minutes=int(request.GET["duration"]))
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        if duration <= timedelta(0):
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        reservations = await sync_to_async(self.load_reservations)(start, end)
+        _, all_rooms, policies = await sync_to_async(rooms.load)()
+
+        open_intervals = {}
+        result = []
+        for room in all_rooms.values():
+            policy = policies[room.pk]
+            if policy not in open_intervals:
+                open_intervals[policy] = availability.opening_hours(start, end, policy)
+            busy = availability.busy_intervals(reservations.get(room.pk, []), room.capacity)
+            slots = availability.free_slots(open_intervals[policy], busy, duration) if room.capacity > 0 else []
+            result.append(
+                {
+                    "room": room.pk,
+                    "name": room.name,
+                    "slots": [
+                        {
+                            "start": timezone.localtime(slot_start).isoformat(),
+                            "end": timezone.localtime(slot_end).isoformat(),
+                        }
+                        for slot_start, slot_end in slots
+                    ],
+                }
+            )
+        return JsonResponse({"ok": True, "rooms": result})
+
+    def load_reservations(self, start, end):
+        """Return the room, start time, end time and blocking of the reservations in a time range, per room."""
+        reservations = {}
+        for room, *reservation in (
+            Reservation.objects.filter(start_time__lt=end, end_time__gt=start)
+            .values_list("room_id", "start_time", "end_time", "block_whole_room")
+            .iterator()
+        ):
+            reservations.setdefault(room, []).append(reservation)
+        return reservations
+
+
+class OccupancyView(LoginRequiredMixin, UserPassesTestMixin, BaseReservationView):
+    """
+    Return the occupancy of all rooms per weekday and hour, for staff only.
+
+    The dates are given by the `from` and `to` query parameters (inclusive). For each room, `occupancy[d][h]` is the
+    average fraction of the seats that is occupied on weekday d + 1 (Monday is 1) from h:00 until h:59, and
+    `blocked[d][h]` the average fraction of that hour in which the room is blocked. This only reads the pre-aggregated
+    OccupancyRollup table.
+    """
+
+    raise_exception = True
+    max_range = timedelta(days=731)
+
+    def test_func(self):
+        """Only allow staff."""
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        """Handle the GET method for this view."""
+        start = dateparse.parse_date(request.GET.get("from", ""))
+        end = dateparse.parse_date(request.GET.get("to", ""))
+        if start is None or end is None or not timedelta(0) <= end - start <= self.max_range:
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        days = [0] * 7
+        for day in range((end - start).days + 1):
+            days[(start + timedelta(days=day)).weekday()] += 1
+
+        totals = {
+            (room, weekday - 1, hour): (seat_minutes, blocked_minutes)
+            for room, weekday, hour, seat_minutes, blocked_minutes in OccupancyRollup.objects.filter(
+                date__range=(start, end)
+            )
+            .values_list("room_id", ExtractIsoWeekDay("date"), "hour")
+            .annotate(Sum("seat_minutes"), Sum("blocked_minutes"))
+            .order_by()
+        }
+
+        result = []
+        for room in rooms.get_rooms().values():
+            occupancy_map = [[0.0] * 24 for _ in range(7)]
+            blocked_map = [[0.0] * 24 for _ in range(7)]
+            for weekday in range(7):
+                for hour in range(24):
+                    seat_minutes, blocked_minutes = totals.get((room.pk, weekday, hour), (0, 0))
+                    if days[weekday] and room.capacity > 0:
+                        occupancy_map[weekday][hour] = round(seat_minutes / (60 * room.capacity * days[weekday]), 3)
+                    if days[weekday]:
+                        blocked_map[weekday][hour] = round(blocked_minutes / (60 * days[weekday]), 3)
+            result.append(
+                {
+                    "room": room.pk,
+                    "name": room.name,
+                    "capacity": room.capacity,
+                    "occupancy": occupancy_map,
+                    "blocked": blocked_map,
+                }
+            )
+        return JsonResponse({"ok": True, "rooms": result})
+
+
+class CreateReservationView(LoginRequiredMixin, IdempotentMixin, BaseReservationView):
+    """
+    View to make a reservation.
+
+    With a `recurrence` in the body, consisting of a daily or weekly `frequency` and an `until` date, a series of
+    reservations is made instead. Daily series skip the weekends.
+    """
 
     raise_exception = True
 
@@ -152,9 +621,31 @@ class CreateReservationView(LoginRequiredMixin, BaseReservationView):
         """Handle the POST method for this view."""
         try:
             room, start_time, end_time = self.load_json()
-        except (KeyError, JSONDecodeError):
+            recurrence = self.load_recurrence()
+        except (KeyError, TypeError, ValueError):
             return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
 
+        if recurrence is not None:
+            return self.write(self.create_series, room, start_time, end_time, *recurrence)
+        return self.write(self.create, room, start_time, end_time)
+
+    def load_recurrence(self):
+        """Extract the optional recurrence from the json body as a frequency and an end date."""
+        recurrence = json.loads(self.request.body).get("recurrence")
+        if recurrence is None:
+            return None
+        if not isinstance(recurrence, dict):
+            raise ValueError("Invalid recurrence")
+
+        frequency = recurrence["frequency"]
+        until = dateparse.parse_date(recurrence["until"])
+        if frequency not in (ReservationSeries.DAILY, ReservationSeries.WEEKLY) or until is None:
+            raise ValueError("Invalid recurrence")
+        return frequency, until
+
+    def create(self, room, start_time, end_time):
+        """Validate and create the reservation while holding the locks on the user and the room."""
+        self.lock(self.request.user, room)
         ok, message = self.validate(room, start_time, end_time, user=self.request.user)
         if not ok:
             return JsonResponse({"ok": False, "message": message})
@@ -163,15 +654,82 @@ class CreateReservationView(LoginRequiredMixin, BaseReservationView):
             return JsonResponse({"ok": False, "message": "You cannot make reservations in the past"})
 
         reservation = Reservation.objects.create(
-            reservee=request.user,
+            reservee=self.request.user,
             room_id=room,
             start_time=start_time,
             end_time=end_time,
         )
+        self.publish("create", reservation)
         return JsonResponse({"ok": True, "pk": reservation.pk})
 
+    def create_series(self, room, start_time, end_time, frequency, until):
+        """
+        Validate and create a series of reservations while holding the locks on the user and the room.
+
+        All occurrences are validated against the overlapping reservations fetched in a single query, and are only
+        created if they are all valid.
+        """
+        occurrences = self.expand(start_time, end_time, frequency, until)
+        if not occurrences:
+            return JsonResponse({"ok": False, "message": "The series needs to end after its first reservation"})
+
+        if start_time < timezone.now():
+            return JsonResponse({"ok": False, "message": "You cannot make reservations in the past"})
 
-class UpdateReservationView(LoginRequiredMixin, BaseReservationView):
+        user = self.request.user
+        capacities = self.lock(user, room)
+        reservations = list(
+            Reservation.objects.filter(
+                Q(room_id=room) | Q(reservee=user),
+                start_time__lt=occurrences[-1][1],
+                end_time__gt=occurrences[0][0],
+            )
+        )
+        for occurrence_start, occurrence_end in occurrences:
+            message = self.check_move(reservations, capacities, room, occurrence_start, occurrence_end)
+            if message is not None:
+                return JsonResponse(
+                    {"ok": False, "message": f"{message} (on {timezone.localtime(occurrence_start):%A %d %B})"}
+                )
+
+        series = ReservationSeries.objects.create(reservee=user, frequency=frequency, until=until)
+        created = [
+            Reservation(
+                reservee=user,
+                room_id=room,
+                start_time=occurrence_start,
+                end_time=occurrence_end,
+                series=series,
+            )
+            for occurrence_start, occurrence_end in occurrences
+        ]
+        self.insert(created)
+        self.publish("create", *created)
+        return JsonResponse({"ok": True, "pk": created[0].pk, "series": series.pk})
+
+    def expand(self, start_time, end_time, frequency, until):
+        """Return the start and end times of all occurrences of a series, up to and including the until date."""
+        start_time = timezone.localtime(start_time)
+        end_time = timezone.localtime(end_time)
+        step = timezone.timedelta(days=1 if frequency == ReservationSeries.DAILY else 7)
+
+        occurrences = []
+        date = start_time.date()
+        while date <= until:
+            if frequency == ReservationSeries.WEEKLY or date.weekday() not in (5, 6):
+                occurrences.append(
+                    (
+                        timezone.make_aware(datetime.combine(date, start_time.time())),
+                        timezone.make_aware(
+                            datetime.combine(date + (end_time.date() - start_time.date()), end_time.time())
+                        ),
+                    )
+                )
+            date += step
+        return occurrences
+
+
+class UpdateReservationView(LoginRequiredMixin, IdempotentMixin, BaseReservationView):
     """View to update your reservation."""
 
     raise_exception = True
@@ -180,68 +738,237 @@ class UpdateReservationView(LoginRequiredMixin, BaseReservationView):
         """Handle the POST method for this view."""
         try:
             room, start_time, end_time = self.load_json()
-        except (KeyError, JSONDecodeError):
+            # Room ids may be sent as strings, like to the create endpoint.
+            room = int(room)
+        except (KeyError, TypeError, ValueError):
             return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
 
-        try:
-            reservation = Reservation.objects.get(pk=pk)
-        except Reservation.DoesNotExist:
+        return self.write(self.update, pk, room, start_time, end_time)
+
+    def update(self, pk, room, start_time, end_time):
+        """Validate and update the reservation while holding the locks on the user and its room."""
+        _, reservations = self.lock_reservations(self.request.user, [pk])
+        reservation = reservations.get(pk)
+        if reservation is None:
             return JsonResponse({"ok": False, "message": "This reservation does not exist"})
 
         if not self.can_edit(reservation):
             return JsonResponse({"ok": False, "message": "You can only update your own events"})
 
-        # If the event took place in the past
-        if reservation.start_time < reservation.end_time < timezone.now():
-            if reservation.start_time == start_time and end_time > timezone.now():  # We can only extend the end time
-                pass
-            else:
-                return JsonResponse({"ok": False, "message": "You cannot update events from the past"})
+        if room != reservation.room_id:
+            return JsonResponse({"ok": False, "message": "You cannot move a reservation to another room"})
 
-        # If the event is active
-        if reservation.start_time < timezone.now() < reservation.end_time:
-            if (
-                reservation.start_time == start_time and end_time > timezone.now()
-            ):  # We can only change the end time to the future
-                pass
-            else:
-                return JsonResponse({"ok": False, "message": "You cannot change the start or end time to this value"})
-
-        # If the event is in the future
-        if timezone.now() < reservation.start_time < reservation.end_time:
-            if start_time < timezone.now():  # We cannot change the start time to the past
-                return JsonResponse({"ok": False, "message": "You cannot change the start time to this value"})
+        message = self.check_update(reservation, start_time, end_time)
+        if message is not None:
+            return JsonResponse({"ok": False, "message": message})
 
-        ok, message = self.validate(room, start_time, end_time, pk=pk, user=self.request.user)
+        ok, message = self.validate(reservation.room_id, start_time, end_time, pk=pk, user=self.request.user)
         if not ok:
             return JsonResponse({"ok": False, "message": message})
 
         reservation.start_time = start_time
         reservation.end_time = end_time
         reservation.save()
+        self.publish("update", reservation)
         return JsonResponse({"ok": True})
 
 
-class DeleteReservationView(LoginRequiredMixin, BaseReservationView):
+class DeleteReservationView(LoginRequiredMixin, IdempotentMixin, BaseReservationView):
     """View to delete your reservation."""
 
     raise_exception = True
 
     def post(self, request, pk, *args, **kwargs):
         """Handle the POST method for this view."""
-        try:
-            reservation = Reservation.objects.get(pk=pk)
-        except Reservation.DoesNotExist:
+        return self.write(self.delete_reservation, pk)
+
+    def delete_reservation(self, pk):
+        """Delete the reservation while holding the locks on the user and its room."""
+        _, reservations = self.lock_reservations(self.request.user, [pk])
+        reservation = reservations.get(pk)
+        if reservation is None:
             return JsonResponse({"ok": False, "message": "This reservation does not exist"})
 
         if not self.can_edit(reservation):
             return JsonResponse({"ok": False, "message": "You can only delete your own events"})
 
-        if reservation.start_time < reservation.end_time < timezone.now():
-            return JsonResponse({"ok": False, "message": "You cannot remove events from the past"})
-
-        if reservation.start_time < timezone.now() < reservation.end_time:
-            return JsonResponse({"ok": False, "message": "You cannot remove this active event"})
+        message = self.check_delete(reservation)
+        if message is not None:
+            return JsonResponse({"ok": False, "message": message})
 
-        reservation.delete()
+        # Deleting the queryset keeps the primary key of the instance, which is published.
+        Reservation.objects.filter(pk=reservation.pk).delete()
+        self.publish("delete", reservation)
         return JsonResponse({"ok": True})
+
+
+class DeleteSeriesView(LoginRequiredMixin, IdempotentMixin, BaseReservationView):
+    """View to delete your series of reservations, except those that are active or in the past."""
+
+    raise_exception = True
+
+    def post(self, request, pk, *args, **kwargs):
+        """Handle the POST method for this view."""
+        return self.write(self.delete_series, pk)
+
+    def delete_series(self, pk):
+        """Delete the reservations of the series while holding the lock on the user."""
+        self.lock(self.request.user)
+        try:
+            series = ReservationSeries.objects.get(pk=pk)
+        except ReservationSeries.DoesNotExist:
+            return JsonResponse({"ok": False, "message": "This series does not exist"})
+
+        if not self.can_edit(series):
+            return JsonResponse({"ok": False, "message": "You can only delete your own events"})
+
+        reservations = list(series.reservation_set.all())
+        deletable = [reservation for reservation in reservations if self.check_delete(reservation) is None]
+        Reservation.objects.filter(pk__in=[reservation.pk for reservation in deletable]).delete()
+        self.publish("delete", *deletable)
+        if len(deletable) == len(reservations):
+            series.delete()
+        return JsonResponse({"ok": True, "deleted": len(deletable)})
+
+
+class BatchReservationView(LoginRequiredMixin, IdempotentMixin, BaseReservationView):
+    """
+    View to create, update and delete multiple reservations at once.
+
+    The body contains a list of `operations`, each with an `action` (create, update or delete) and the fields of
+    the corresponding single endpoint. The operations are validated in order against one snapshot of the
+    overlapping reservations, which includes the effects of the earlier operations in the batch. All valid
+    operations are applied in a single transaction and the response contains a result for each operation.
+    """
+
+    raise_exception = True
+    max_operations = 100
+
+    def post(self, request, *args, **kwargs):
+        """Handle the POST method for this view."""
+        try:
+            operations = self.load_operations()
+        except (KeyError, TypeError, ValueError):
+            return HttpResponseBadRequest(json.dumps({"ok": "False", "message": "Bad request"}))
+
+        return self.write(self.apply, operations)
+
+    def load_operations(self):
+        """Extract the operations from the json body."""
+        operations = json.loads(self.request.body)["operations"]
+        if not isinstance(operations, list) or len(operations) > self.max_operations:
+            raise ValueError("Invalid operations")
+
+        loaded = []
+        for operation in operations:
+            action = operation["action"]
+            if action == "create":
+                loaded.append({"action": action, "pk": None, "room": int(operation["room"])})
+            elif action in ("update", "delete"):
+                loaded.append({"action": action, "pk": int(operation["pk"])})
+            else:
+                raise ValueError(f"Invalid action: {action}")
+            if action in ("create", "update"):
+                for field in ("start_time", "end_time"):
+                    loaded[-1][field] = dateparse.parse_datetime(operation[field])
+                    if loaded[-1][field] is None:
+                        raise ValueError(f"Invalid {field}")
+        return loaded
+
+    def apply(self, operations):
+        """Validate and apply the operations while holding the locks on the user and all involved rooms."""
+        user = self.request.user
+        capacities, targets = self.lock_reservations(
+            user,
+            [operation["pk"] for operation in operations if operation["pk"]],
+            *{operation["room"] for operation in operations if operation["action"] == "create"},
+        )
+
+        # All reservations that may collide with the operations, keyed by primary key or position in the batch.
+        reservations = dict(targets)
+        moves = [operation for operation in operations if operation["action"] != "delete"]
+        if moves:
+            reservations.update(
+                (reservation.pk, reservation)
+                for reservation in Reservation.objects.filter(
+                    Q(room_id__in=capacities) | Q(reservee=user),
+                    start_time__lt=max(operation["end_time"] for operation in moves),
+                    end_time__gt=min(operation["start_time"] for operation in moves),
+                ).exclude(pk__in=targets)
+            )
+
+        results = []
+        created = []
+        updated = {}
+        deleted = {}
+        for index, operation in enumerate(operations):
+            action = operation["action"]
+            reservation = reservations.get(operation["pk"]) if action != "create" else None
+            if action == "create":
+                message = self.check_move(
+                    reservations.values(),
+                    capacities,
+                    operation["room"],
+                    operation["start_time"],
+                    operation["end_time"],
+                )
+                if message is None and operation["start_time"] < timezone.now():
+                    message = "You cannot make reservations in the past"
+            elif reservation is None:
+                message = "This reservation does not exist"
+            elif not self.can_edit(reservation):
+                message = f"You can only {action} your own events"
+            elif action == "update":
+                message = self.check_update(reservation, operation["start_time"], operation["end_time"])
+                if message is None:
+                    message = self.check_move(
+                        reservations.values(),
+                        capacities,
+                        reservation.room_id,
+                        operation["start_time"],
+                        operation["end_time"],
+                        reservation,
+                    )
+            else:
+                message = self.check_delete(reservation)
+
+            if message is not None:
+                results.append({"ok": False, "message": message})
+                continue
+
+            results.append({"ok": True})
+            if action == "create":
+                reservation = Reservation(
+                    reservee=user,
+                    room_id=operation["room"],
+                    start_time=operation["start_time"],
+                    end_time=operation["end_time"],
+                )
+                reservations[("new", index)] = reservation
+                created.append((results[-1], reservation))
+            elif action == "update":
+                reservation.start_time = operation["start_time"]
+                reservation.end_time = operation["end_time"]
+                updated[reservation.pk] = reservation
+            else:
+                del reservations[reservation.pk]
+                updated.pop(reservation.pk, None)
+                deleted[reservation.pk] = reservation
+
+        if deleted:
+            Reservation.objects.filter(pk__in=deleted).delete()
+            self.publish("delete", *deleted.values())
+        if updated:
+            Reservation.objects.bulk_update(updated.values(), ["start_time", "end_time"])
+            bulk_changed(
+                added=[occupancy.state(reservation) for reservation in updated.values()],
+                removed=[occupancy.loaded_state(reservation) for reservation in updated.values()],
+            )
+            self.publish("update", *updated.values())
+        if created:
+            self.insert([reservation for _, reservation in created])
+            for result, reservation in created:
+                result["pk"] = reservation.pk
+            self.publish("create", *[reservation for _, reservation in created])
+
+        return JsonResponse({"ok": True, "results": results})
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SagexitConfig(AppConfig):
+    """Appconfig for the project app."""
+
+    name = "sagexit"
+
+    def ready(self):
+        """Connect the signal receivers."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,49 @@
+import os
+
+import django
+from django.core.handlers import asgi
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sagexit.settings.development")
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    ASGI handler that can send the content of streaming responses asynchronously.
+
+    Django only iterates streaming responses synchronously, which blocks the event loop while a long-lived stream
+    waits for content. Requests handled by this handler have `async_streaming` set, so views can return a streaming
+    response without content and with an async iterable as `async_streaming_content`, which is sent instead.
+    """
+
+    def create_request(self, scope, body_file):
+        """Create the request and mark that it supports async streaming."""
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.async_streaming = True
+        return request, error_response
+
+    async def send_response(self, response, send):
+        """Send the response, followed by its async streaming content if it has any."""
+        content = getattr(response, "async_streaming_content", None)
+        if content is None:
+            return await super().send_response(response, send)
+
+        async def send_content(message):
+            # Send the async content just before the final message, after the headers and the (empty) content.
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                parts = content.__aiter__()
+                try:
+                    async for part in parts:
+                        await send(
+                            {"type": "http.response.body", "body": response.make_bytes(part), "more_body": True}
+                        )
+                finally:
+                    if hasattr(parts, "aclose"):
+                        await parts.aclose()
+            await send(message)
+
+        await super().send_response(response, send_content)
+
+
+django.setup(set_prefix=False)
+application = ASGIHandler()
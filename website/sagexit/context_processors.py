@@ -1,12 +1,37 @@
+from time import monotonic
+
 from django.conf import settings  # import the settings file
 from sp.models import IdP
 
+# Changes made in other processes are picked up after this many seconds, as signals only reach the current process.
+DEFAULT_SSO_TIMEOUT = 300
+
+_default_sso = None
+
+
+def get_default_sso():
+    """
+    Return the default IdP, or None if there is none.
+
+    The IdP is cached per process, so rendering a page does not query for it.
+    """
+    global _default_sso
+    if _default_sso is None or _default_sso[0] < monotonic():
+        slug = getattr(settings, "DEFAULT_SSO_SLUG", None)
+        if slug is None:
+            idp = IdP.objects.filter(is_active=True).first()
+        else:
+            idp = IdP.objects.filter(slug=slug).first()
+        _default_sso = (monotonic() + DEFAULT_SSO_TIMEOUT, idp)
+    return _default_sso[1]
+
+
+def invalidate_default_sso():
+    """Forget the cached default IdP."""
+    global _default_sso
+    _default_sso = None
+
 
 def default_sso(request):
     """Context processor for the default SSO object"""
-    try:
-        return {"DEFAULT_SSO": IdP.objects.get(slug=settings.DEFAULT_SSO_SLUG)}
-    except AttributeError:
-        return {"DEFAULT_SSO": IdP.objects.filter(is_active=True).first()}
-    except:
-        return {}
+    return {"DEFAULT_SSO": get_default_sso()}
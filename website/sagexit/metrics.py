@@ -0,0 +1,242 @@
+"""
+Request metrics in the Prometheus text format.
+
+`MetricsMiddleware` records the latency, the number of SQL queries and the SQL time of every request per view, in
+histograms that are kept in memory by every process. Each process regularly copies its histograms to the cache, so
+`metrics` can add up the histograms of all processes. Counters, like the number of rate limited requests, are kept in
+the same way. Requests slower than `SLOW_REQUEST_THRESHOLD` seconds are logged
+with their slowest queries.
+
+Everything is disabled unless the `METRICS_ENABLED` setting is true.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "sagexit:metrics:processes"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    "sagexit_request_duration_seconds": ("Time spent handling requests", DURATION_BUCKETS),
+    "sagexit_request_queries": ("Number of SQL queries per request", QUERY_BUCKETS),
+    "sagexit_request_sql_duration_seconds": ("Time spent in SQL queries per request", DURATION_BUCKETS),
+}
+
+COUNTERS = {
+    "sagexit_rate_limited_requests_total": "Number of requests that were rejected by the rate limit",
+}
+
+
+class Histograms:
+    """Histograms and counters per metric and view, kept in the memory of the current process."""
+
+    def __init__(self):
+        """Create empty histograms."""
+        self.lock = threading.Lock()
+        self.values = {}
+        self.key = f"sagexit:metrics:{socket.gethostname()}:{os.getpid()}"
+        self.next_flush = monotonic()
+
+    def observe(self, view, duration, queries, sql_duration):
+        """Record the metrics of a request to view."""
+        with self.lock:
+            for metric, value in (
+                ("sagexit_request_duration_seconds", duration),
+                ("sagexit_request_queries", queries),
+                ("sagexit_request_sql_duration_seconds", sql_duration),
+            ):
+                buckets = HISTOGRAMS[metric][1]
+                counts = self.values.setdefault((metric, view), [0] * (len(buckets) + 2))
+                for i, bound in enumerate(buckets):
+                    if value <= bound:
+                        counts[i] += 1
+                        break
+                else:
+                    counts[len(buckets)] += 1
+                counts[-1] += value
+
+    def increment(self, metric, view):
+        """Increment a counter for view."""
+        with self.lock:
+            counts = self.values.setdefault((metric, view), [0])
+            counts[0] += 1
+
+    def flush(self, force=False):
+        """Copy the histograms to the cache, at most once every `METRICS_FLUSH_INTERVAL` seconds unless forced."""
+        if not force and monotonic() < self.next_flush:
+            return
+        with self.lock:
+            self.next_flush = monotonic() + settings.METRICS_FLUSH_INTERVAL
+            snapshot = {key: list(counts) for key, counts in self.values.items()}
+        cache.set(self.key, snapshot, SNAPSHOT_TIMEOUT)
+        # The index is repaired on every flush, in case another process overwrote it at the same time.
+        index = cache.get(INDEX_KEY, set())
+        if self.key not in index:
+            cache.set(INDEX_KEY, index | {self.key}, None)
+
+
+histograms = Histograms()
+
+
+# The duration and SQL of the queries of the request that is handled in the current context.
+request_queries = ContextVar("request_queries", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute a query and record its duration and SQL if a request is handled in the current context."""
+    queries = request_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((perf_counter() - start, sql))
+
+
+def install_wrapper(connection, **kwargs):
+    """Record the queries of a database connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """Middleware that records the metrics of every request, for both sync and async requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Only use this middleware if metrics are enabled."""
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark this middleware as async, so Django awaits it.
+            markcoroutinefunction(self)
+        connection_created.connect(install_wrapper)
+
+    def __call__(self, request):
+        """Handle a request and record its metrics."""
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        # Connections are wrapped when they connect, but a connection may have connected before this middleware.
+        install_wrapper(connection)
+        queries = []
+        token = request_queries.set(queries)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        self.observe(request, perf_counter() - start, queries)
+        histograms.flush()
+        return response
+
+    async def __acall__(self, request):
+        """Handle an async request and record its metrics."""
+        queries = []
+        token = request_queries.set(queries)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        self.observe(request, perf_counter() - start, queries)
+        if monotonic() >= histograms.next_flush:
+            await sync_to_async(histograms.flush)()
+        return response
+
+    def observe(self, request, duration, queries):
+        """Record the metrics of a request and log it if it was slow."""
+        view = request.resolver_match.view_name if request.resolver_match is not None else "unresolved"
+        sql_duration = sum(query_duration for query_duration, _ in queries)
+        histograms.observe(view, duration, len(queries), sql_duration)
+        if duration >= settings.SLOW_REQUEST_THRESHOLD:
+            slowest = sorted(queries, key=lambda query: query[0], reverse=True)[:3]
+            logger.warning(
+                "Slow request %s %s (%s) took %.0f ms, of which %.0f ms in %d queries. Slowest queries:%s",
+                request.method,
+                request.path,
+                view,
+                duration * 1000,
+                sql_duration * 1000,
+                len(queries),
+                "".join(f"\n  {query_duration * 1000:.0f} ms: {sql[:500]}" for query_duration, sql in slowest),
+            )
+
+
+def escape(value):
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(values):
+    """Render the histograms and counters in the Prometheus text format."""
+    lines = []
+    for metric, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, view), counts in sorted(values.items()):
+            if name != metric:
+                continue
+            label = f'view="{escape(view)}"'
+            cumulative = 0
+            for bound, count in zip((*buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label}}} {counts[-1]}")
+            lines.append(f"{metric}_count{{{label}}} {cumulative}")
+    for metric, description in COUNTERS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, view), counts in sorted(values.items()):
+            if name == metric:
+                lines.append(f'{metric}{{view="{escape(view)}"}} {counts[0]}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics(request):
+    """
+    Return the histograms and counters of all processes in the Prometheus text format.
+
+    Only staff and requests with the `METRICS_TOKEN` as bearer token are allowed.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if not request.user.is_staff and not (token and constant_time_compare(authorization, f"Bearer {token}")):
+        return HttpResponseForbidden()
+
+    histograms.flush(force=True)
+    index = cache.get(INDEX_KEY, set())
+    snapshots = cache.get_many(index)
+    if len(snapshots) < len(index):
+        cache.set(INDEX_KEY, set(snapshots), None)
+
+    values = {}
+    for snapshot in snapshots.values():
+        for key, counts in snapshot.items():
+            total = values.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+    return HttpResponse(render(values), content_type="text/plain; version=0.0.4")
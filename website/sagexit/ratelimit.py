@@ -0,0 +1,109 @@
+"""
+Rate limiting of views, with token buckets in the cache.
+
+`RateLimitMiddleware` limits the views in the `RATE_LIMITS` setting, which maps view names to rates like `30/m`
+(30 requests per minute). Every client has a bucket per view, which holds as many tokens as the rate allows per
+period and refills at that rate. Clients are identified by their session cookie, or by their IP address if they do not
+have one, and every IP address also has a bucket shared by all limited views, with the `RATE_LIMIT_PER_IP` rate.
+
+The buckets are kept as counters per period, which are increased with `cache.incr`. The tokens taken in the previous
+period count for the part of that period that overlaps the last period before now, which approximates a bucket that
+refills continuously. This requires a cache that increments atomically, like memcached, Redis or the local memory
+cache, so the database and file caches, which can lose concurrent increments, are refused. Requests are limited before
+the session or user is loaded, so limiting a request costs a few cache operations and no queries of its own.
+
+Everything is disabled unless the `RATE_LIMIT_ENABLED` setting is true.
+"""
+import math
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+# Caches that implement incr as a get followed by a set, which loses increments made at the same time.
+NON_ATOMIC_CACHES = (BaseDatabaseCache, FileBasedCache)
+
+
+def parse_rate(rate):
+    """Return the number of requests and the period in seconds of a rate like 30/m."""
+    count, _, period = rate.partition("/")
+    return int(count), PERIODS[period]
+
+
+def take(key, rate, now=None):
+    """
+    Take a token from the bucket of key and return 0, or the number of seconds until a token is available.
+
+    Tokens are also taken when none are available, so clients that keep sending requests stay limited.
+    """
+    limit, period = parse_rate(rate)
+    now = time() if now is None else now
+    window = int(now // period)
+    taken = cache_incr(f"sagexit:ratelimit:{key}:{window}", period)
+    previous = cache.get(f"sagexit:ratelimit:{key}:{window - 1}", 0)
+
+    elapsed = now / period - window
+    if previous * (1 - elapsed) + taken <= limit:
+        return 0
+    if taken > limit:
+        return math.ceil((window + 1) * period - now)
+    # The bucket refills as the previous period stops overlapping.
+    return max(math.ceil((1 - (limit - taken) / previous - elapsed) * period), 1)
+
+
+def cache_incr(key, period):
+    """Increase the counter of key, which is created if it does not exist, and return its new value."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter has to survive the next period, in which it is the previous one.
+        if cache.add(key, 1, period * 2 + 1):
+            return 1
+        return cache.incr(key)
+
+
+def client_key(request):
+    """Return the identifier of the client of a request, without loading its session."""
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return f"session:{md5(session_key.encode()).hexdigest()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Middleware that responds with 429 Too Many Requests to clients that exceed the rate limit of a view."""
+
+    def __init__(self, get_response=None):
+        """Only use this middleware if rate limiting is enabled, with a cache that increments atomically."""
+        if not settings.RATE_LIMIT_ENABLED:
+            raise MiddlewareNotUsed
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], NON_ATOMIC_CACHES):
+            raise ImproperlyConfigured("Rate limiting requires a cache that increments atomically, like memcached")
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Limit the request if the view is rate limited and the client exceeds its limit."""
+        view = request.resolver_match.view_name
+        rate = settings.RATE_LIMITS.get(view)
+        if rate is None:
+            return None
+
+        retry_after = take(f"{view}:{client_key(request)}", rate)
+        if not retry_after and settings.RATE_LIMIT_PER_IP:
+            retry_after = take(f"ip:{request.META.get('REMOTE_ADDR', '')}", settings.RATE_LIMIT_PER_IP)
+        if not retry_after:
+            return None
+
+        metrics.histograms.increment("sagexit_rate_limited_requests_total", view)
+        response = JsonResponse({"ok": False, "message": "Too many requests, please try again later"}, status=429)
+        response["Retry-After"] = str(retry_after)
+        return response
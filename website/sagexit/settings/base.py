@@ -37,6 +37,8 @@ AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend", "sp.back
 
 
 MIDDLEWARE = [
+    "sagexit.metrics.MetricsMiddleware",
+    "sagexit.ratelimit.RateLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -123,3 +125,35 @@ USE_TZ = True
 LOGIN_REDIRECT_URL = "/"
 
 DEFAULT_SSO_SLUG = "science"
+
+# Reservations that ended more than this many days ago are moved to the archive by `manage.py archive_reservations`
+RESERVATION_ARCHIVE_DAYS = 365
+
+# Request metrics, see sagexit.metrics. /metrics is available to staff and with the token as bearer token.
+METRICS_ENABLED = False
+METRICS_TOKEN = None
+METRICS_FLUSH_INTERVAL = 10
+SLOW_REQUEST_THRESHOLD = 1.0
+
+# Rate limits per client of the views with these names, see sagexit.ratelimit. Every IP address is also limited to
+# RATE_LIMIT_PER_IP requests to all these views together.
+RATE_LIMIT_ENABLED = False
+RATE_LIMITS = {
+    "room_reservation:calendar": "60/m",
+    "room_reservation:events": "120/m",
+    "room_reservation:stream": "30/m",
+    "room_reservation:availability": "60/m",
+    "room_reservation:ical": "60/m",
+    "room_reservation:create_reservation": "30/m",
+    "room_reservation:update_reservation": "30/m",
+    "room_reservation:delete_reservation": "30/m",
+    "room_reservation:delete_series": "10/m",
+    "room_reservation:batch_reservation": "10/m",
+}
+RATE_LIMIT_PER_IP = "600/m"
+
+# Delivers reservation changes to the open change streams, see room_reservation.changes
+RESERVATION_BROKER = "room_reservation.changes.LocalBroker"
+# Under WSGI, an open change stream occupies a thread for minutes, so change streams are only served by the ASGI
+# server unless this is enabled.
+WSGI_CHANGE_STREAMS = False
@@ -5,6 +5,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# The development server only serves WSGI, and has threads to spare.
+WSGI_CHANGE_STREAMS = True
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
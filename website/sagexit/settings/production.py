@@ -18,6 +18,24 @@ DATABASES = {
     }
 }
 
+# The cache is shared by all uWSGI workers, so cached reservations are invalidated for all of them at once. Memcached
+# serves it without queries, and increments its counters (versions and rate limits) atomically.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.memcached.MemcachedCache",
+        "LOCATION": f"{os.environ.get('MEMCACHED_HOST', 'memcached')}:{os.environ.get('MEMCACHED_PORT', 11211)}",
+    }
+}
+
+# Reservation changes are streamed to the browsers connected to any of the uvicorn workers, and are made by any of the
+# uWSGI workers.
+RESERVATION_BROKER = "room_reservation.changes.PostgresBroker"
+
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get("DJANGO_METRICS_TOKEN")
+
+RATE_LIMIT_ENABLED = True
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -44,11 +62,20 @@ LOGGING = {
             "level": os.environ.get("DJANGO_LOG_LEVEL", "INFO"),
             "propagate": False,
         },
+        "sagexit": {
+            "handlers": ["file"],
+            "level": os.environ.get("DJANGO_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
     },
 }
 
 STATIC_ROOT = "/sagexit/static/"
 STATIC_URL = "/static/"
+# Static files get hashed names and compressed copies at collectstatic, see sagexit.storage. The SCSS is compiled by
+# compilescss before that, so it is not recompiled on requests.
+STATICFILES_STORAGE = "sagexit.storage.CompressedManifestStaticFilesStorage"
+SASS_PROCESSOR_ENABLED = False
 
 MEDIA_ROOT = "/sagexit/media/"
 MEDIA_URL = "/media/"
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from sp.models import IdP
+
+from . import context_processors
+
+
+@receiver(post_save, sender=IdP)
+@receiver(post_delete, sender=IdP)
+def idp_changed(sender, **kwargs):
+    """Forget the cached default IdP when an IdP changes."""
+    context_processors.invalidate_default_sso()
@@ -0,0 +1,65 @@
+"""
+Static file storage with content-hashed names and precompressed files.
+
+`collectstatic` stores every file under a name that contains the hash of its content, like
+`js/calendar-init.3f2a1c9b8d7e.js`, which `{% static %}` and `{% sass_src %}` use. The content behind such a name
+never changes, so the web server serves them with far-future cache headers. Next to every hashed text file, a gzip
+(`.gz`) and, if the `brotli` package is installed, a brotli (`.br`) compressed copy is stored, which the web server
+sends to clients that accept them instead of compressing the file on every request.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSED_EXTENSIONS = (".css", ".js", ".map", ".json", ".svg", ".txt", ".xml", ".html", ".ico", ".eot", ".ttf")
+# Smaller files do not become smaller enough to be worth an extra file.
+MIN_SIZE = 256
+
+
+def compress_gzip(content):
+    """Return the gzip compressed content, without a timestamp so the result only depends on the content."""
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def compress_brotli(content):
+    """Return the brotli compressed content, or None if brotli is not installed."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(content)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also stores compressed copies of the hashed files."""
+
+    compressors = {".gz": compress_gzip, ".br": compress_brotli}
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the files and then compress the hashed files."""
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.lower().endswith(COMPRESSED_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        """
+        Store the compressed copies of a hashed file that do not exist yet.
+
+        A hashed name always has the same content, so copies that exist from an earlier run are up to date. Copies
+        that are not smaller than the file are not stored.
+        """
+        missing = [extension for extension in self.compressors if not self.exists(name + extension)]
+        if not missing:
+            return
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < MIN_SIZE:
+            return
+        for extension in missing:
+            compressed = self.compressors[extension](content)
+            if compressed is not None and len(compressed) < len(content):
+                self._save(name + extension, ContentFile(compressed))
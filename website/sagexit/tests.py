@@ -0,0 +1,171 @@
+import gzip
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import reverse
+from sp.models import IdP
+
+from room_reservation import rooms
+from sagexit import context_processors, metrics, ratelimit
+
+
+@override_settings(DEFAULT_SSO_SLUG="science")
+class DefaultSSOTest(TestCase):
+    def setUp(self):
+        context_processors.invalidate_default_sso()
+
+    def create_idp(self, slug):
+        return IdP.objects.create(name=slug, slug=slug, base_url="http://testserver", metadata_url="")
+
+    def test_cached(self):
+        idp = self.create_idp("science")
+        self.assertEqual(context_processors.get_default_sso(), idp)
+        rooms.get_rooms()
+        with self.assertNumQueries(0):
+            response = Client().get(reverse("room_reservation:calendar"))
+        self.assertContains(response, idp.get_login_url())
+
+    def test_invalidated(self):
+        self.assertIsNone(context_processors.get_default_sso())
+        idp = self.create_idp("science")
+        self.assertEqual(context_processors.get_default_sso(), idp)
+        idp.delete()
+        self.assertIsNone(context_processors.get_default_sso())
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="secret", SLOW_REQUEST_THRESHOLD=10)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.histograms.values.clear()
+
+    def test_metrics(self):
+        client = Client()
+        client.get(reverse("room_reservation:events"), {"start": "2021-03-01", "end": "2021-03-08"})
+        response = client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('sagexit_request_duration_seconds_count{view="room_reservation:events"} 1', content)
+        self.assertIn('sagexit_request_queries_bucket{view="room_reservation:events",le="1"} 1', content)
+
+    async def test_async_requests(self):
+        # The test database connected before the middleware was loaded, which would wrap it when connecting.
+        await sync_to_async(metrics.install_wrapper)(connection)
+        # The async test client of Django 3.1 ignores query parameters given as data.
+        await AsyncClient().get(f"{reverse('room_reservation:events')}?start=2021-03-01&end=2021-03-08")
+        # The query runs in another thread, but is counted for the request.
+        queries = metrics.histograms.values[("sagexit_request_queries", "room_reservation:events")]
+        self.assertEqual(queries[metrics.QUERY_BUCKETS.index(1)], 1)
+
+    def test_protected(self):
+        self.assertEqual(Client().get(reverse("metrics")).status_code, 403)
+        self.assertEqual(Client().get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_requests_logged(self):
+        with self.assertLogs("sagexit.metrics", "WARNING") as logs:
+            Client().get(reverse("room_reservation:events"), {"start": "2021-03-01", "end": "2021-03-08"})
+        self.assertIn("Slow request GET /reservations/events (room_reservation:events)", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        Client().get(reverse("room_reservation:events"), {"start": "2021-03-01", "end": "2021-03-08"})
+        self.assertEqual(metrics.histograms.values, {})
+        self.assertEqual(Client().get(reverse("metrics")).status_code, 404)
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={"room_reservation:events": "2/m", "room_reservation:availability": "5/m"},
+    RATE_LIMIT_PER_IP="3/m",
+)
+class RateLimitTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.histograms.values.clear()
+        self.url = reverse("room_reservation:events")
+        self.data = {"start": "2021-03-01", "end": "2021-03-08"}
+
+    def test_limited(self):
+        client = Client()
+        self.assertEqual(client.get(self.url, self.data).status_code, 200)
+        self.assertEqual(client.get(self.url, self.data).status_code, 200)
+        with self.assertNumQueries(0):
+            response = client.get(self.url, self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()["ok"])
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(
+            metrics.histograms.values[("sagexit_rate_limited_requests_total", "room_reservation:events")], [1]
+        )
+
+    @override_settings(RATE_LIMIT_PER_IP="4/m")
+    def test_per_session(self):
+        for session in ("first", "second"):
+            client = Client()
+            client.cookies["sessionid"] = session
+            self.assertEqual(client.get(self.url, self.data).status_code, 200)
+            self.assertEqual(client.get(self.url, self.data).status_code, 200)
+        # Both sessions share the IP address of the test client, which has used up its limit.
+        self.assertEqual(Client().get(self.url, self.data).status_code, 429)
+
+    def test_unlimited_views(self):
+        for _ in range(5):
+            self.assertEqual(Client().get(reverse("room_reservation:calendar")).status_code, 200)
+
+    def test_sliding_window(self):
+        for _ in range(10):
+            self.assertEqual(ratelimit.take("test", "10/m", now=110), 0)
+        self.assertEqual(ratelimit.take("test", "10/m", now=119), 1)
+        # 11 tokens were taken in the previous minute, of which three quarters still count.
+        self.assertEqual(ratelimit.take("test", "10/m", now=135), 0)
+        # The bucket is full again when less than 8/11 of the previous minute overlaps.
+        self.assertEqual(ratelimit.take("test", "10/m", now=135), 2)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN="secret")
+    def test_counter(self):
+        client = Client()
+        for _ in range(3):
+            client.get(self.url, self.data)
+        response = Client().get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertIn(
+            'sagexit_rate_limited_requests_total{view="room_reservation:events"} 1', response.content.decode()
+        )
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(Client().get(self.url, self.data).status_code, 200)
+
+    def test_database_cache_refused(self):
+        with mock.patch.object(ratelimit, "caches", {"default": DatabaseCache("sagexit_cache", {})}):
+            with self.assertRaises(ImproperlyConfigured):
+                ratelimit.RateLimitMiddleware(lambda request: None)
+
+
+class CompressedManifestStorageTest(TestCase):
+    def test_collectstatic(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root, STATICFILES_STORAGE="sagexit.storage.CompressedManifestStaticFilesStorage"
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["*.scss"])
+            url = staticfiles_storage.url("js/calendar-init.js")
+            self.assertRegex(url, r"^/static/js/calendar-init\.[0-9a-f]{12}\.js$")
+
+            path = os.path.join(root, url[len("/static/") :])
+            with open(path, "rb") as file, gzip.open(path + ".gz") as compressed:
+                self.assertEqual(compressed.read(), file.read())
+            # Images are compressed already.
+            self.assertFalse(
+                os.path.exists(os.path.join(root, staticfiles_storage.stored_name("img/icon.png")) + ".gz")
+            )
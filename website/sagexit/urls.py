@@ -3,6 +3,8 @@ from django.shortcuts import redirect
 from django.urls import path, include
 from django.views.generic import RedirectView
 
+from sagexit.metrics import metrics
+
 
 def logout(request):
     auth.logout(request)
@@ -15,4 +17,5 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("logout/", logout, name="logout"),
     path("sso/", include("sp.urls")),
+    path("metrics", metrics, name="metrics"),
 ]